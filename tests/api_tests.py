@@ -1,11 +1,27 @@
+# -*- coding: utf-8 -*-
+
 from translation_manager.settings import get_settings
 
 if get_settings('TRANSLATIONS_ENABLE_API_COMMUNICATION'):
+    import gzip
+    import io
+    import json
+
+    from django.core.cache import caches
+    from django.test import override_settings
+    from django.utils import timezone
     from rest_framework.test import APITestCase
+    from translation_manager.cache import get_payload_key
     from translation_manager.models import TranslationEntry
     from translation_manager import defaults
 
 
+    def get_json(response):
+        if response.streaming:
+            return json.loads(b''.join(response.streaming_content).decode('utf-8'))
+        return json.loads(response.content.decode('utf-8'))
+
+
     class TranslationTests(APITestCase):
         def setUp(self):
             TranslationEntry.objects.create(language='cs', original='admin-test', is_published=True)
@@ -14,9 +30,96 @@ if get_settings('TRANSLATIONS_ENABLE_API_COMMUNICATION'):
         def test_get_translations(self):
             defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
             response = self.client.get('/translations/cs/')
-            self.assertTrue(len(response.data) == 2)
+            self.assertTrue(len(get_json(response)) == 2)
 
         def test_force_filter(self):
             defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = ['admin-']
             response = self.client.get('/translations/cs/')
-            self.assertTrue(len(response.data) == 1)
+            self.assertTrue(len(get_json(response)) == 1)
+
+        @override_settings(TRANSLATIONS_API_CACHE='default', TRANSLATIONS_API_RETURN_ALL=True,
+                           CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                               'LOCATION': 'test_cached_translations'}})
+        def test_cached_translations(self):
+            defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
+            response = self.client.get('/translations/cs/')
+            self.assertEqual(len(get_json(response)), 2)
+
+            with self.assertNumQueries(0):
+                response = self.client.get('/translations/cs/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(len(get_json(self.client.get('/translations/cs/'))), 2)
+
+            TranslationEntry.objects.create(language='cs', original='test-new', is_published=True)
+            response = self.client.get('/translations/cs/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(get_json(response)), 3)
+
+            with self.assertNumQueries(0):
+                response = self.client.get('/translations/cs/', HTTP_ACCEPT_ENCODING='deflate, gzip;q=0.5')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            self.assertEqual(len(json.loads(gzip.GzipFile(fileobj=io.BytesIO(response.content)).read().decode('utf-8'))), 3)
+
+            response = self.client.get('/translations/cs/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+            # payloads of stale versions are overwritten, unknown languages are not cached
+            self.assertEqual([key for key in caches['default']._cache if 'api_payloads' in key],
+                             [caches['default'].make_key(get_payload_key('cs'))])
+            self.assertEqual(self.client.get('/translations/zz0/').status_code, 400)
+            self.assertEqual(len([key for key in caches['default']._cache if 'api_payloads' in key]), 1)
+
+        @override_settings(TRANSLATIONS_API_RETURN_ALL=True)
+        def test_streamed_translations(self):
+            defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
+            TranslationEntry.objects.create(language='cs', original='test', translation=u'"čeština"',
+                                            locale_path='other', is_published=True)
+            response = self.client.get('/translations/cs/')
+            self.assertTrue(response.streaming)
+            self.assertEqual(get_json(response), {'admin-test': '', 'test': u'"čeština"'})
+
+        @override_settings(TRANSLATIONS_API_RETURN_ALL=False)
+        def test_delta_translations(self):
+            defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
+            version = get_json(self.client.get('/translations/cs/?since=0'))['version']
+
+            entry = TranslationEntry.objects.get(original='test')
+            entry.translation = 'test_translation'
+            entry.save()
+            TranslationEntry.objects.filter(original='admin-test').update(is_published=False, changed=timezone.now())
+
+            delta = get_json(self.client.get('/translations/cs/?since=%s' % version))
+            self.assertEqual(delta['changed'], {'test': 'test_translation'})
+            self.assertEqual(delta['removed'], ['admin-test'])
+            self.assertGreater(delta['version'], version)
+
+            delta = get_json(self.client.get('/translations/cs/?since=%s' % delta['version']))
+            self.assertEqual((delta['changed'], delta['removed']), ({}, []))
+            self.assertEqual(self.client.get('/translations/cs/?since=foo').status_code, 400)
+            self.assertEqual(self.client.get('/translations/cs/?since=99999999999999999999').status_code, 400)
+
+        @override_settings(TRANSLATIONS_API_RETURN_ALL=True)
+        def test_batch_translations(self):
+            defaults.TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
+            TranslationEntry.objects.create(language='en', original='admin-test', translation='test_en',
+                                            domain='djangojs', is_published=True)
+
+            with self.assertNumQueries(1):
+                translations = get_json(self.client.get('/translations/?languages=cs,en'))
+            self.assertEqual(translations, {'cs': {'admin-test': '', 'test': ''}, 'en': {'admin-test': 'test_en'}})
+            self.assertEqual(self.client.get('/translations/?languages=cs,de').status_code, 400)
+
+            translations = get_json(self.client.get('/translations/?languages=cs,en&domains=djangojs&prefixes=admin-'))
+            self.assertEqual(translations, {'cs': {}, 'en': {'admin-test': 'test_en'}})
+
+            with self.settings(TRANSLATIONS_API_CACHE='default',
+                               CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                   'LOCATION': 'test_batch_translations'}}):
+                self.assertEqual(get_json(self.client.get('/translations/?languages=cs,en')),
+                                 {'cs': {'admin-test': '', 'test': ''}, 'en': {'admin-test': 'test_en'}})
+                with self.assertNumQueries(0):
+                    self.assertEqual(get_json(self.client.get('/translations/?languages=en')),
+                                     {'en': {'admin-test': 'test_en'}})
@@ -1,8 +1,26 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import timedelta
+
+from gettext import GNUTranslations
+
+import polib
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from translation_manager.catalog import iter_po_entries, iter_po_entries_with_flags
+from translation_manager.filters import get_state_counts
 from translation_manager.manager import Manager as TranslationManager
-from translation_manager.models import TranslationEntry
+from translation_manager.utils import filter_queryset, get_original_hash
+from translation_manager.models import TranslationEntry, TranslationBackup, TranslationBackupContent
 from django.core.management import call_command
 
 from translation_manager import tasks
@@ -12,6 +30,21 @@ from translation_manager.settings import get_settings
 if get_settings('TRANSLATIONS_PROCESSING_METHOD') == 'async_django_rq':
     from django_rq import get_queue, get_worker
 
+def write_pofile(locale_dir, language, domain, messages):
+    """
+    Writes po file with given (msgid, msgstr) messages into locale dir
+    """
+    path = os.path.join(locale_dir, language, 'LC_MESSAGES')
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    pofile = polib.POFile()
+    for i, (msgid, msgstr) in enumerate(messages):
+        pofile.append(polib.POEntry(msgid=msgid, msgstr=msgstr, occurrences=[('templates/test.html', str(i))]))
+    pofile_path = os.path.join(path, '%s.po' % domain)
+    pofile.save(pofile_path)
+    return pofile_path
+
+
 class TranslationCase(TestCase):
     def setUp(self):
         self.username = 'test_user'
@@ -38,6 +71,518 @@ class TranslationCase(TestCase):
         self.assertEqual(entry.locale_path, 'tests/locale')
         self.assertEqual(entry.locale_parent_dir, 'tests')
 
+    def test_store_to_db_bulk(self):
+        """
+        Tests that storing po file makes the same number of queries regardless of its size
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+
+        small = write_pofile(locale_dir, 'cs', 'small', [('small-%s' % i, '') for i in range(2)])
+        big = write_pofile(locale_dir, 'cs', 'big', [('big-%s' % i, '') for i in range(40)])
+
+        manager = TranslationManager()
+        with self.assertNumQueries(6):
+            manager.store_to_db(small, 'cs')
+        with self.assertNumQueries(6):
+            manager.store_to_db(big, 'cs')
+
+        self.assertEqual(TranslationEntry.objects.filter(domain='big').count(), 40)
+
+        # stored again, only changed occurrences are updated
+        write_pofile(locale_dir, 'cs', 'big', [('big-%s' % i, '') for i in reversed(range(40))])
+        manager.store_to_db(big, 'cs')
+        self.assertEqual(TranslationEntry.objects.filter(domain='big').count(), 40)
+        self.assertEqual(TranslationEntry.objects.get(original='big-0').occurrences, 'templates/test.html:39')
+
+    def test_create_entries_conflict(self):
+        """
+        Tests that entries created meanwhile by another process are skipped
+        """
+        TranslationEntry.objects.create(language='cs', original='test-existing', locale_path='locale', domain='django')
+        entries = [TranslationEntry(language='cs', original=original, original_hash=get_original_hash(original),
+                                    locale_path='locale', domain='django') for original in ('test-existing', 'test-new')]
+
+        self.assertEqual(TranslationManager().create_entries(entries), 1)
+        self.assertEqual(TranslationEntry.objects.filter(original__in=['test-existing', 'test-new']).count(), 2)
+
+    def test_admin_duplicate_original(self):
+        """
+        Tests that admin rejects original already existing in the same po file
+        """
+        entry = TranslationEntry.objects.create(original='test-duplicate', language='cs', domain='django',
+                                                locale_path='tests/locale')
+        self.client.login(username=self.username, password=self.password)
+
+        url = '/admin/translation_manager/translationentry/%s/change/' % entry.pk
+        response = self.client.post(url, {'original': 'test-case1', 'translation': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['adminform'].form.errors['original'])
+        self.assertEqual(TranslationEntry.objects.get(pk=entry.pk).original, 'test-duplicate')
+
+        response = self.client.post(url, {'original': 'test-unique', 'translation': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(TranslationEntry.objects.get(pk=entry.pk).original_hash, get_original_hash('test-unique'))
+
+    def test_resolve_hints(self):
+        """
+        Tests that hints of entries are resolved by a single query
+        """
+        for language, translation in (('en', 'Title'), ('de', 'Titel'), ('cs', '')):
+            TranslationEntry.objects.create(language=language, original='test-title', translation=translation,
+                                            locale_path='locale', domain='django')
+        TranslationEntry.objects.create(language='en', original='test-title', translation='Other',
+                                        locale_path='other', domain='django')
+        TranslationEntry.objects.create(language='cs', original='test-missing', locale_path='locale', domain='django')
+
+        with self.settings(TRANSLATIONS_HINT_LANGUAGE='en'):
+            with self.assertNumQueries(2):
+                entries = list(TranslationEntry.objects.filter(language='cs', locale_path='locale').with_hints())
+            self.assertEqual(dict((entry.original, entry.get_hint()) for entry in entries),
+                             {'test-title': 'Title', 'test-missing': ''})
+
+            with self.assertNumQueries(1):
+                self.assertEqual(TranslationEntry(language='cs', original='test-title', locale_path='other',
+                                                  domain='django').get_hint(), 'Other')
+
+        with self.settings(TRANSLATIONS_HINT_LANGUAGE=['en', 'de']):
+            entry = TranslationEntry.objects.with_hints().get(language='cs', original_hash=get_original_hash('test-title'))
+            self.assertEqual(entry.get_hint(), 'en: Title | de: Titel')
+            self.assertEqual(entry._hints, {'en': 'Title', 'de': 'Titel'})
+
+    def test_state_counts(self):
+        """
+        Tests that translation state counts are made by a single query and cached by catalog version
+        """
+        TranslationEntry.objects.create(language='cs', original='test-a', translation='test-a_translation')
+        TranslationEntry.objects.create(language='cs', original='test-b')
+        queryset = TranslationEntry.objects.filter(original__in=['test-a', 'test-b'])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_state_counts(queryset), (2, 1))
+
+        with self.settings(TRANSLATIONS_API_CACHE='default',
+                           CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                               'LOCATION': 'test_state_counts'}}):
+            self.assertEqual(get_state_counts(queryset), (2, 1))
+            with self.assertNumQueries(0):
+                self.assertEqual(get_state_counts(queryset), (2, 1))
+                self.assertEqual(get_state_counts(queryset.none()), (0, 0))
+
+            TranslationEntry.objects.create(language='cs', original='test-b', translation='test-b_translation',
+                                            domain='djangojs')
+            self.assertEqual(get_state_counts(queryset), (3, 2))
+
+    def test_iter_po_entries(self):
+        """
+        Tests that streamed po entries are the same as polib's ones
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('multi\nline "quoted"', 'translated\tvalue'), ('other', '')])
+        po = polib.pofile(pofile)
+        po.append(polib.POEntry(msgid='one', msgid_plural='many', msgstr_plural={0: 'jeden', 1: 'mnoho'}))
+        po.append(polib.POEntry(msgid='old', msgstr='stare', obsolete=True))
+        po.save()
+
+        self.assertEqual(
+            list(iter_po_entries(pofile)),
+            [(m.msgid, m.msgstr, m.occurrences) for m in polib.pofile(pofile)]
+        )
+
+    def test_postprocess_reconciliation(self):
+        """
+        Tests that postprocess changes only entries whose published state differs
+        """
+        stale = TranslationEntry.objects.create(original='test-stale', language='cs', domain='django',
+                                                locale_path='tests/locale', is_published=True)
+
+        manager = TranslationManager()
+        self.assertEqual(manager.load_data_from_po(force=True), (0, 1))
+        self.assertFalse(TranslationEntry.objects.get(pk=stale.pk).is_published)
+
+        TranslationEntry.objects.filter(original='test-case1').update(is_published=False)
+        self.assertEqual(manager.postprocess(), (1, 0))
+        self.assertEqual(manager.postprocess(), (0, 0))
+
+    def test_load_data_from_po_skips_unchanged(self):
+        """
+        Tests that unchanged po files are not loaded again, but stay published
+        """
+        TranslationEntry.objects.filter(original='test-case1').update(translation='changed')
+
+        self.assertEqual(TranslationManager().load_data_from_po(), (0, 0))
+        entry = TranslationEntry.objects.get(original='test-case1')
+        self.assertTrue(entry.is_published)
+        self.assertEqual(entry.translation, 'changed')
+
+        manager = TranslationManager()
+        pofile = os.path.join(os.path.dirname(__file__), 'locale', 'cs', 'LC_MESSAGES', 'django.po')
+        self.assertEqual(manager.filter_changed_pofiles([(pofile, 'cs')])[0], [])
+        self.assertEqual(manager.filter_changed_pofiles([(pofile, 'cs')], force=True)[0], [(pofile, 'cs')])
+
+    def test_load_data_from_po_after_makemessages(self):
+        """
+        Tests that po files are loaded again after their entries were changed outside of load
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_translation'), ('test-b', '')])
+        with open(pofile, 'rb') as f:
+            content = f.read()
+
+        with self.settings(LOCALE_PATHS=[os.path.join(os.path.dirname(__file__), 'locale'), locale_dir]):
+            TranslationManager().load_data_from_po()
+
+            manager = TranslationManager()
+            manager.store_to_db(write_pofile(locale_dir, 'cs', 'django', [('test-a', '')]), 'cs')
+            manager.postprocess()
+            self.assertFalse(TranslationEntry.objects.get(original='test-b').is_published)
+
+            with open(pofile, 'wb') as f:
+                f.write(content)
+            TranslationManager().load_data_from_po()
+        self.assertTrue(TranslationEntry.objects.get(original='test-b').is_published)
+
+    def test_load_data_from_po_after_delete(self):
+        """
+        Tests that entries deleted in admin are loaded again from unchanged po file
+        """
+        TranslationEntry.objects.get(original='test-case1').delete()
+
+        TranslationManager().load_data_from_po()
+        self.assertTrue(TranslationEntry.objects.get(original='test-case1').is_published)
+
+    def test_compile_translations(self):
+        """
+        Tests that compile writes po and mo files of all languages
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-b', 'test-b_translation'), ('test-a', ''),
+                                                           ('test-c', 'test-c_translation')])
+        manager = TranslationManager()
+        manager.store_to_db(pofile, 'cs', store_translations=True)
+
+        locale_path = os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path]):
+            timings = manager.compile_translations()
+        self.assertEqual(sorted(timing[:3] for timing in timings),
+                         [('cs', locale_path, 'django'), ('en', locale_path, 'django')])
+
+        mofile = polib.mofile(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo'))
+        self.assertEqual([(m.msgid, m.msgstr) for m in mofile],
+                         [('test-b', 'test-b_translation'), ('test-c', 'test-c_translation')])
+        self.assertEqual(len(polib.pofile(os.path.join(locale_dir, 'en', 'LC_MESSAGES', 'django.po'))), 0)
+
+        os.remove(os.path.join(locale_dir, 'en', 'LC_MESSAGES', 'django.po'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path], TRANSLATIONS_COMPILE_PO_FILES=False):
+            self.assertEqual(manager.compile_translations(), [])
+
+            entry = TranslationEntry.objects.get(original='test-c')
+            entry.translation = 'test-c_changed'
+            entry.save()
+            self.assertEqual([timing[:3] for timing in manager.compile_translations()],
+                             [('cs', locale_path, 'django')])
+
+            # unchanged files are not written again
+            self.assertEqual([timing[4:] for timing in manager.compile_translations(full=True)], [(0, 1), (0, 1)])
+        self.assertFalse(os.path.exists(os.path.join(locale_dir, 'en', 'LC_MESSAGES', 'django.po')))
+        with open(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo'), 'rb') as mofile:
+            self.assertEqual(GNUTranslations(mofile).gettext('test-c'), 'test-c_changed')
+
+    def test_compile_translations_workers(self):
+        """
+        Tests that compile with workers inside a transaction compiles by this process
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_cs')])
+        pofile = write_pofile(locale_dir, 'en', 'django', [('test-a', 'test-a_en')])
+        manager = TranslationManager()
+        manager.store_to_db(pofile, 'en', store_translations=True)
+        manager.store_to_db(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.po'), 'cs', store_translations=True)
+
+        locale_path = os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path]):
+            timings = manager.compile_translations(workers=2)
+        self.assertEqual(sorted(timing[:3] for timing in timings),
+                         [('cs', locale_path, 'django'), ('en', locale_path, 'django')])
+        self.assertFalse(connection.needs_rollback)
+        self.assertTrue(TranslationEntry.objects.filter(original='test-a').exists())
+
+        for language in ('cs', 'en'):
+            mofile = polib.mofile(os.path.join(locale_dir, language, 'LC_MESSAGES', 'django.mo'))
+            self.assertEqual([(m.msgid, m.msgstr) for m in mofile], [('test-a', 'test-a_%s' % language)])
+
+    def test_compile_translations_command(self):
+        """
+        Tests that compile_translations command compiles changed files and reports them
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_translation')])
+        TranslationManager().store_to_db(pofile, 'cs', store_translations=True)
+
+        locale_path = os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path]):
+            stdout = StringIO()
+            call_command('compile_translations', workers=2, stdout=stdout)
+            self.assertIn('Compiled 2 catalogs', stdout.getvalue())
+
+            stdout = StringIO()
+            call_command('compile_translations', stdout=stdout)
+            self.assertIn('Compiled 0 catalogs', stdout.getvalue())
+
+        mofile = polib.mofile(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo'))
+        self.assertEqual([(m.msgid, m.msgstr) for m in mofile], [('test-a', 'test-a_translation')])
+
+    def test_compile_translations_deleted(self):
+        """
+        Tests that compile rewrites files whose entries were deleted or unpublished
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_translation'),
+                                                           ('test-b', 'test-b_translation')])
+        manager = TranslationManager()
+        manager.store_to_db(pofile, 'cs', store_translations=True)
+        mofile_path = os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo')
+
+        locale_path = os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path]):
+            manager.compile_translations()
+
+            TranslationEntry.objects.get(original='test-b').delete()
+            self.assertEqual([timing[:3] for timing in manager.compile_translations()],
+                             [('cs', locale_path, 'django')])
+            self.assertEqual([m.msgid for m in polib.mofile(mofile_path)], ['test-a'])
+
+            manager.set_published(TranslationEntry.objects.filter(locale_path=locale_path).values_list('pk', flat=True),
+                                  False)
+            self.assertEqual([timing[:3] for timing in manager.compile_translations()],
+                             [('cs', locale_path, 'django')])
+            self.assertEqual(len(polib.mofile(mofile_path)), 0)
+            self.assertEqual(manager.compile_translations(), [])
+
+    def test_compile_static_bundles(self):
+        """
+        Tests that compile writes json bundles named by content hash and their manifest
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        bundles_dir = os.path.join(locale_dir, 'bundles')
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_translation'), ('test-b', '')])
+        manager = TranslationManager()
+        manager.store_to_db(pofile, 'cs', store_translations=True)
+        TranslationEntry.objects.create(language='cs', original='test-js', translation='test-js_translation',
+                                        locale_path='other', domain='djangojs')
+
+        locale_path = os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))
+        with self.settings(TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS=[locale_path], TRANSLATIONS_API_RETURN_ALL=False,
+                           TRANSLATIONS_STATIC_BUNDLES_DIR=bundles_dir, TRANSLATIONS_STATIC_BUNDLES_DOMAINS=['djangojs']):
+            manager.compile_translations()
+
+            with open(os.path.join(bundles_dir, 'manifest.json')) as manifest_file:
+                manifest = json.load(manifest_file)
+            with open(os.path.join(bundles_dir, manifest['cs']['file'])) as bundle:
+                translations = json.load(bundle)
+            self.assertEqual(translations['test-a'], 'test-a_translation')
+            self.assertEqual(translations['test-js'], 'test-js_translation')
+            self.assertNotIn('test-b', translations)
+            with open(os.path.join(bundles_dir, manifest['cs']['domains']['djangojs'])) as bundle:
+                self.assertEqual(json.load(bundle), {'test-js': 'test-js_translation'})
+            with gzip.open(os.path.join(bundles_dir, manifest['cs']['domains']['djangojs'] + '.gz')) as bundle:
+                self.assertEqual(json.loads(bundle.read().decode('utf-8')), {'test-js': 'test-js_translation'})
+
+            entry = TranslationEntry.objects.get(original='test-a')
+            entry.translation = 'test-a_changed'
+            entry.save()
+            manager.compile_translations()
+
+            with open(os.path.join(bundles_dir, 'manifest.json')) as manifest_file:
+                changed_manifest = json.load(manifest_file)
+            self.assertNotEqual(changed_manifest['cs']['file'], manifest['cs']['file'])
+            self.assertEqual(changed_manifest['cs']['domains'], manifest['cs']['domains'])
+            # bundles of the previous manifest are kept
+            self.assertTrue(os.path.exists(os.path.join(bundles_dir, manifest['cs']['file'] + '.gz')))
+            self.assertEqual(manager.compile_translations(), [])
+            self.assertTrue(os.path.exists(os.path.join(bundles_dir, manifest['cs']['file'])))
+
+            # entries outside of compiled locale paths are exported too
+            entry = TranslationEntry.objects.get(original='test-js')
+            entry.translation = 'test-js_changed'
+            entry.save()
+            self.assertEqual(manager.compile_translations(), [])
+
+        with open(os.path.join(bundles_dir, 'manifest.json')) as manifest_file:
+            last_manifest = json.load(manifest_file)
+        with open(os.path.join(bundles_dir, last_manifest['cs']['domains']['djangojs'])) as bundle:
+            self.assertEqual(json.load(bundle), {'test-js': 'test-js_changed'})
+        self.assertTrue(os.path.exists(os.path.join(bundles_dir, changed_manifest['cs']['file'])))
+        self.assertFalse(os.path.exists(os.path.join(bundles_dir, manifest['cs']['file'] + '.gz')))
+        self.assertFalse(os.path.exists(os.path.join(bundles_dir, manifest['cs']['file'])))
+
+    def test_backup_po_to_db(self):
+        """
+        Tests that unchanged po files are backed up only once and stored compressed
+        """
+        manager = TranslationManager()
+        manager.backup_po_to_db()
+        manager.backup_po_to_db()
+
+        backup = TranslationBackup.objects.get()
+        self.assertEqual(backup.language, 'cs')
+        self.assertIn(u'msgstr "test-case1_translation"', backup.content)
+
+        TranslationBackup.objects.create(language='cs', locale_path='foo', domain='django', content=backup.content)
+        self.assertEqual(TranslationBackupContent.objects.count(), 1)
+
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofiles = [write_pofile(locale_dir, language, domain, [('test-%s' % domain, '')])
+                   for language in ('cs', 'en') for domain in ('django', 'djangojs')]
+
+        with self.settings(LOCALE_PATHS=[locale_dir], TRANSLATIONS_CLEAN_PO_AFTER_BACKUP=True):
+            manager.backup_po_to_db()
+
+        self.assertEqual(TranslationBackup.objects.count(), 2 + 4)
+        self.assertEqual(TranslationBackupContent.objects.count(), 1 + 2)
+        for pofile in pofiles:
+            self.assertEqual(os.path.getsize(pofile), 0)
+
+    def test_force_filters_prefix_mode(self):
+        """
+        Tests that prefix mode filters by namespaces the same originals as contains mode does
+        """
+        manager = TranslationManager()
+        manager.store_to_db(os.path.join(os.path.dirname(__file__), 'locale', 'cs', 'LC_MESSAGES', 'django.po'), 'cs')
+        TranslationEntry.objects.create(language='cs', original='front-test-title')
+        TranslationEntry.objects.create(language='cs', original='front')
+        self.assertEqual(TranslationEntry.objects.get(original='front-test-title').namespace, 'front-')
+        self.assertEqual(TranslationEntry.objects.get(original='front').namespace, '')
+
+        filters = ['test-', 'front-test-', 'fro']
+        contains = set(filter_queryset(TranslationEntry.objects.all(), filters).values_list('original', flat=True))
+        with self.settings(TRANSLATIONS_FORCE_FILTERS_MODE='prefix'):
+            queryset = filter_queryset(TranslationEntry.objects.all(), filters)
+            self.assertIn('namespace', str(queryset.query))
+            self.assertEqual(set(queryset.values_list('original', flat=True)), contains)
+        self.assertIn('front', contains)
+        self.assertIn('front-test-title', contains)
+
+    def test_prune_backups(self):
+        """
+        Tests that pruning keeps newest backups of every file and removes unused contents
+        """
+        now = timezone.now()
+        for days in range(4):
+            for domain in ('django', 'djangojs'):
+                backup = TranslationBackup.objects.create(language='cs', locale_path='locale', domain=domain,
+                                                          content=u'%s %s' % (domain, days))
+                TranslationBackup.objects.filter(pk=backup.pk).update(created=now - timedelta(days=days * 10))
+
+        manager = TranslationManager()
+        self.assertEqual(manager.prune_backups(), (0, 0))
+        self.assertEqual(manager.prune_backups(keep_last=3, batch_size=1), (2, 2))
+        self.assertEqual(manager.prune_backups(max_age=15), (2, 2))
+        self.assertEqual(manager.prune_backups(max_age=1), (2, 2))
+
+        self.assertEqual(sorted(backup.content for backup in TranslationBackup.objects.all()),
+                         [u'django 0', u'djangojs 0'])
+        self.assertEqual(TranslationBackupContent.objects.count(), 2)
+
+    def test_restore_backups(self):
+        """
+        Tests that the newest selected backup of every file is restored to po and mo files
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_old')])
+        manager = TranslationManager()
+        manager.store_to_db(pofile, 'cs', store_translations=True)
+
+        with self.settings(LOCALE_PATHS=[locale_dir], TRANSLATIONS_CLEAN_PO_AFTER_BACKUP=True):
+            manager.backup_po_to_db()
+            write_pofile(locale_dir, 'cs', 'django', [('test-a', 'test-a_new'), ('test-b', 'test-b_new')])
+            manager.backup_po_to_db()
+        self.assertEqual(os.path.getsize(pofile), 0)
+
+        backups = TranslationBackup.objects.filter(language='cs', domain='django',
+                                                   locale_path=os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR')))
+        self.assertEqual(len(backups), 2)
+        manager.restore_backups(backups, reimport=True)
+
+        self.assertEqual([entry[:2] for entry in iter_po_entries(pofile)],
+                         [('test-a', 'test-a_new'), ('test-b', 'test-b_new')])
+        with open(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo'), 'rb') as mofile:
+            self.assertEqual(GNUTranslations(mofile).gettext('test-b'), 'test-b_new')
+        self.assertEqual(TranslationEntry.objects.get(original='test-a').translation, 'test-a_new')
+        self.assertEqual(TranslationEntry.objects.get(original='test-b').translation, 'test-b_new')
+
+    def test_restore_backups_fuzzy(self):
+        """
+        Tests that fuzzy and obsolete entries of restored backup are not compiled to mo file
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('ok', 'OK')])
+        po = polib.pofile(pofile)
+        po.append(polib.POEntry(msgid='fz', msgstr='FUZZY', flags=['python-format', 'fuzzy']))
+        po.append(polib.POEntry(msgid='old', msgstr='OLD', obsolete=True))
+        po.save()
+
+        self.assertEqual([entry[:1] + entry[3:] for entry in iter_po_entries_with_flags(pofile)],
+                         [('ok', False, False), ('fz', True, False), ('old', False, True)])
+
+        manager = TranslationManager()
+        with self.settings(LOCALE_PATHS=[locale_dir]):
+            manager.backup_po_to_db()
+        manager.restore_backups(TranslationBackup.objects.filter(
+            locale_path=os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR'))))
+
+        mofile = polib.mofile(os.path.join(locale_dir, 'cs', 'LC_MESSAGES', 'django.mo'))
+        self.assertEqual([(m.msgid, m.msgstr) for m in mofile], [('ok', 'OK')])
+
+    @override_settings(TRANSLATIONS_MODE='P')
+    def test_postprocess_promiscuous(self):
+        """
+        Tests that promiscuous mode creates published entries in every locale path
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        pofile = write_pofile(locale_dir, 'cs', 'django', [('test-other', 'test-other_translation')])
+
+        manager = TranslationManager()
+        manager.store_to_db(os.path.join(os.path.dirname(__file__), 'locale', 'cs', 'LC_MESSAGES', 'django.po'),
+                            'cs', store_translations=True)
+        manager.store_to_db(pofile, 'cs', store_translations=True)
+        manager.postprocess()
+
+        self.assertEqual(TranslationEntry.objects.filter(original='test-case1', is_published=True).count(), 2)
+        self.assertEqual(TranslationEntry.objects.filter(original='test-other', is_published=True).count(), 2)
+        replicated = TranslationEntry.objects.get(original='test-case1',
+                                                  locale_path=os.path.relpath(locale_dir, get_settings('TRANSLATIONS_BASE_DIR')))
+        self.assertEqual(replicated.translation, 'test-case1_translation')
+
+        self.assertEqual(manager.postprocess(), (0, 0))
+
+    def test_load_data_from_po_workers(self):
+        """
+        Tests that po files parsed by worker processes are stored to db
+        """
+        locale_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, locale_dir)
+        write_pofile(locale_dir, 'cs', 'django', [('test-other', 'test-other_translation')])
+        write_pofile(locale_dir, 'en', 'django', [('test-other', 'test-other_en')])
+
+        with self.settings(LOCALE_PATHS=[os.path.join(os.path.dirname(__file__), 'locale'), locale_dir]):
+            TranslationManager().load_data_from_po(workers=2)
+
+        self.assertTrue(TranslationEntry.objects.get(original='test-case1').is_published)
+        self.assertEqual(TranslationEntry.objects.get(original='test-other', language='en').translation,
+                         'test-other_en')
+
     def test_makemessages_django_1_4_19(self):
         call_command('makemessages')
 
@@ -4,7 +4,6 @@ from django.contrib import admin
 from django.core.urlresolvers import reverse
 from django.http import HttpResponseRedirect, JsonResponse
 from django.utils.translation import ugettext_lazy as _
-from django.conf import settings
 
 from .manager import Manager
 from .models import TranslationEntry, TranslationBackup
@@ -125,10 +124,12 @@ class TranslationEntryAdmin(admin.ModelAdmin):
         return HttpResponseRedirect(reverse("admin:translation_manager_translationentry_changelist"))
 
     def compile_translations_view(self, request):
-        manager = Manager()
-        for language, language_name in settings.LANGUAGES:
-            manager.update_po_from_db(lang=language)
-        post_save.send(sender=None, request=request)
+        if str(get_settings('TRANSLATIONS_PROCESSING_METHOD')) == 'async_django_rq':
+            tasks.compile_translations_task.delay()
+        else:
+            manager = Manager()
+            manager.compile_translations()
+            post_save.send(sender=None, request=request)
 
         self.message_user(request, _("admin-translation_manager-translations_compiled"))
         return HttpResponseRedirect(reverse("admin:translation_manager_translationentry_changelist"))
@@ -140,19 +141,23 @@ class TranslationEntryAdmin(admin.ModelAdmin):
 
 
 def restore(modeladmin, request, queryset):
-    for backup in queryset:
-        backup.restore()
+    Manager().restore_backups(queryset)
 restore.short_description = _("admin-translation_manager-backups_restore_option")
 
 
+def restore_and_reimport(modeladmin, request, queryset):
+    Manager().restore_backups(queryset, reimport=True)
+restore_and_reimport.short_description = _("admin-translation_manager-backups_restore_and_reimport_option")
+
+
 class TranslationBackupAdmin(admin.ModelAdmin):
     actions_on_bottom = True
-    actions = [restore]
+    actions = [restore, restore_and_reimport]
     save_on_top = True
     fields = ('created', 'language', 'locale_parent_dir', 'domain', 'content')
     list_display = ('created', 'language', 'locale_parent_dir', 'domain')
     list_filter = ('created', 'language', 'locale_parent_dir', 'domain')
-    readonly_fields = ('created', 'language', 'locale_parent_dir', 'domain')
+    readonly_fields = ('created', 'language', 'locale_parent_dir', 'domain', 'content')
 
 
 admin.site.register(TranslationEntry, TranslationEntryAdmin)
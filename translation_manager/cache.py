@@ -0,0 +1,62 @@
+import time
+
+from datetime import datetime
+
+from django.core.cache import caches
+from django.utils.timezone import utc
+
+from .settings import get_settings
+
+
+CATALOG_VERSION_KEY = 'translation_manager:catalog_version'
+
+
+def get_cache():
+    "Returns cache of TRANSLATIONS_API_CACHE alias or None if caching is disabled"
+    alias = get_settings('TRANSLATIONS_API_CACHE')
+    if not alias:
+        return None
+    return caches[alias]
+
+
+def get_catalog_version():
+    """
+    Returns version of translations catalog as integer timestamp in
+    microseconds, or None if caching is disabled. Version is bumped whenever
+    translations are compiled, loaded or edited.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = bump_catalog_version()
+    return version
+
+
+def bump_catalog_version():
+    "Sets new catalog version, so all cached payloads become stale"
+    cache = get_cache()
+    if cache is None:
+        return None
+    version = get_current_version()
+    current = cache.get(CATALOG_VERSION_KEY)
+    if current is not None and version <= current:
+        version = current + 1
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def get_version_datetime(version):
+    "Returns utc datetime of catalog version"
+    return datetime.fromtimestamp(version // 1000000, utc).replace(microsecond=version % 1000000)
+
+
+def get_current_version():
+    "Returns current time as catalog version"
+    return int(time.time() * 1000000)
+
+
+def get_payload_key(language):
+    "Returns cache key of (version, payloads) of language, overwritten on new catalog version"
+    return 'translation_manager:api_payloads:%s' % language
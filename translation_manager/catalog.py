@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import hashlib
+import os
+import re
+import struct
+import tempfile
+
+from polib import escape, unescape
+
+
+PO_KEYWORDS = ('msgctxt', 'msgid', 'msgid_plural', 'msgstr')
+
+VOLATILE_HEADERS_RE = re.compile(br'(POT-Creation-Date|PO-Revision-Date):[^\\\n]*')
+
+
+def parse_occurrences(line):
+    "Parses occurrences line as polib does '#: foo.py:1 bar.py' => [('foo.py', '1'), ('bar.py', '')]"
+    occurrences = []
+    for occurrence in line[3:].split():
+        fil, sep, num = occurrence.rpartition(':')
+        if not sep or not num.isdigit():
+            fil, num = occurrence, ''
+        occurrences.append((fil, num))
+    return occurrences
+
+
+def iter_po_entries(path):
+    """
+    Yields (msgid, msgstr, occurrences) of po file entries one by one.
+
+    Unlike polib.pofile the whole file is never held in memory, but the
+    entries are the same as polib's ones: metadata entry is skipped,
+    obsolete entries are included and msgstr of plural entries is empty.
+    """
+    for msgid, msgstr, occurrences, fuzzy, obsolete in iter_po_entries_with_flags(path):
+        yield msgid, msgstr, occurrences
+
+
+def iter_po_entries_with_flags(path):
+    """
+    Yields (msgid, msgstr, occurrences, fuzzy, obsolete) of po file entries
+    one by one, entries are the same as the ones of iter_po_entries.
+    """
+    msgid = msgstr = None
+    occurrences = []
+    fuzzy = obsolete = False
+    state = None
+    metadata_found = False
+
+    with codecs.open(path, 'r', 'utf-8') as po:
+        for linenum, line in enumerate(po, 1):
+            if linenum == 1 and line.startswith(codecs.BOM_UTF8.decode('utf-8')):
+                line = line[1:]
+            line = line.strip()
+            if not line:
+                continue
+
+            tokens = line.split(None, 2)
+            if tokens[0] == '#~|':
+                continue
+            if tokens[0] == '#~' and len(tokens) > 1:
+                line = line[3:].strip()
+                tokens = tokens[1:]
+                entry_obsolete = True
+            else:
+                entry_obsolete = False
+
+            if line[:1] == '"':
+                # continuation line
+                value = unescape(line[1:-1])
+                if state == 'msgid':
+                    msgid += value
+                elif state == 'msgstr':
+                    msgstr += value
+                continue
+
+            if line[:7] == 'msgstr[':
+                state = 'msgstr_plural'
+                continue
+
+            if state in ('msgstr', 'msgstr_plural'):
+                # any other line starts next entry
+                if msgid is not None:
+                    if msgid == '' and not obsolete and not metadata_found:
+                        metadata_found = True
+                    else:
+                        yield msgid, msgstr or '', occurrences, fuzzy, obsolete
+                msgid = msgstr = None
+                occurrences = []
+                fuzzy = False
+                state = None
+
+            if tokens[0] in PO_KEYWORDS and len(tokens) > 1:
+                value = unescape(line[len(tokens[0]):].strip()[1:-1])
+                state = tokens[0]
+                if state == 'msgid':
+                    msgid = value
+                    obsolete = entry_obsolete
+                elif state == 'msgstr':
+                    msgstr = value
+            elif tokens[0] == '#:':
+                occurrences.extend(parse_occurrences(line))
+                state = None
+            elif tokens[0] == '#,':
+                fuzzy = fuzzy or 'fuzzy' in [flag.strip() for flag in line[2:].split(',')]
+                state = None
+            elif line[0] == '#':
+                state = None
+            else:
+                raise IOError('Syntax error in po file %s(line %s)' % (path, linenum))
+
+    if msgid is not None and state is not None:
+        if not (msgid == '' and not obsolete and not metadata_found):
+            yield msgid, msgstr or '', occurrences, fuzzy, obsolete
+
+
+def format_po_string(keyword, value):
+    "Formats po keyword line, multiline values are split after newlines"
+    lines = value.splitlines(True)
+    if len(lines) <= 1:
+        return u'%s "%s"\n' % (keyword, escape(value))
+    return u'%s ""\n' % keyword + u''.join(u'"%s"\n' % escape(line) for line in lines)
+
+
+def format_po(metadata, entries):
+    """
+    Returns po file content of metadata (key, value) pairs and
+    (msgid, msgstr, occurrences) entries, occurrences separated by whitespace.
+    """
+    header = u''.join(u'%s: %s\n' % (key, value) for key, value in metadata)
+    parts = [u'#\n', format_po_string(u'msgid', u''), format_po_string(u'msgstr', header)]
+
+    for msgid, msgstr, occurrences in entries:
+        parts.append(u'\n')
+        if occurrences.strip():
+            parts.append(u'#: %s\n' % u' '.join(occurrences.split()))
+        parts.append(format_po_string(u'msgid', msgid))
+        parts.append(format_po_string(u'msgstr', msgstr))
+
+    return u''.join(parts)
+
+
+def hash_string(value):
+    "GNU gettext hashpjw hash of bytes"
+    hval = 0
+    for char in bytearray(value):
+        hval = (hval << 4) + char
+        g = hval & 0xf0000000
+        if g:
+            hval ^= g >> 24
+            hval ^= g
+    return hval
+
+
+def next_prime(seed):
+    "Returns smallest odd prime greater or equal to seed"
+    seed |= 1
+    while any(seed % divisor == 0 for divisor in range(3, int(seed ** 0.5) + 1, 2)):
+        seed += 2
+    return seed
+
+
+def format_mo(metadata, entries):
+    """
+    Returns binary gettext catalog of metadata (key, value) pairs and
+    (msgid, msgstr) entries, including the hash table used by GNU gettext.
+    """
+    header = u''.join(u'%s: %s\n' % (key, value) for key, value in metadata)
+
+    messages = {b'': header.encode('utf-8')}
+    for msgid, msgstr in entries:
+        msgid = msgid.encode('utf-8')
+        if msgid not in messages:
+            messages[msgid] = msgstr.encode('utf-8')
+    msgids = sorted(messages)
+    count = len(msgids)
+
+    hash_size = max(next_prime(count * 4 // 3), 3)
+    originals_offset = 7 * 4
+    translations_offset = originals_offset + count * 8
+    hash_offset = translations_offset + count * 8
+    data_offset = hash_offset + hash_size * 4
+
+    hash_table = [0] * hash_size
+    originals = []
+    translations = []
+    data = []
+    offset = data_offset
+
+    for i, msgid in enumerate(msgids):
+        originals.append((len(msgid), offset))
+        data.append(msgid + b'\0')
+        offset += len(msgid) + 1
+
+        hash_value = hash_string(msgid)
+        index = hash_value % hash_size
+        increment = 1 + (hash_value % (hash_size - 2))
+        while hash_table[index]:
+            if index >= hash_size - increment:
+                index -= hash_size - increment
+            else:
+                index += increment
+        hash_table[index] = i + 1
+
+    for msgid in msgids:
+        msgstr = messages[msgid]
+        translations.append((len(msgstr), offset))
+        data.append(msgstr + b'\0')
+        offset += len(msgstr) + 1
+
+    return b''.join([
+        struct.pack('<7I', 0x950412de, 0, count, originals_offset, translations_offset, hash_size, hash_offset),
+        b''.join(struct.pack('<2I', length, position) for length, position in originals),
+        b''.join(struct.pack('<2I', length, position) for length, position in translations),
+        struct.pack('<%sI' % hash_size, *hash_table),
+    ] + data)
+
+
+def get_content_hash(content):
+    "Returns sha1 hex digest of po or mo file content ignoring volatile header dates"
+    return hashlib.sha1(VOLATILE_HEADERS_RE.sub(br'\1:', content)).hexdigest()
+
+
+def write_file(path, content):
+    """
+    Writes content bytes to temporary file renamed to path, so readers never
+    see a partially written file. Nothing is written if the file already has
+    the same content apart from volatile header dates. Returns True if the
+    file was written.
+    """
+    if os.path.exists(path):
+        with open(path, 'rb') as current:
+            if get_content_hash(current.read()) == get_content_hash(content):
+                return False
+        mode = os.stat(path).st_mode & 0o777
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.%s.' % os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return True
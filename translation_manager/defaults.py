@@ -36,6 +36,22 @@ TRANSLATIONS_MODE = "N"
 # application will be stored.
 TRANSLATIONS_ALLOW_NO_OCCURRENCES = False
 
+# Number of rows written by a single query when storing
+# translations from .po files to db.
+TRANSLATIONS_BULK_BATCH_SIZE = 500
+
+# Number of processes parsing .po files when loading them to db.
+# Parsed messages are always stored to db by the main process.
+TRANSLATIONS_LOAD_WORKERS = 1
+
+# Write .po files when compiling translations.
+# If False, only .mo files used by gettext at runtime are written.
+TRANSLATIONS_COMPILE_PO_FILES = True
+
+# Number of processes compiling .po and .mo files of languages.
+# Every process opens its own db connection.
+TRANSLATIONS_COMPILE_WORKERS = 1
+
 # Dirs and files ignored for makemessages.
 # TRANSLATIONS_IGNORED_PATHS = ['env', 'foo', 'bar']
 TRANSLATIONS_IGNORED_PATHS = ['env']
@@ -46,14 +62,41 @@ TRANSLATIONS_MAKE_BACKUPS = True
 # Clean .po files (delete content) after backup (this prevents duplicities)
 TRANSLATIONS_CLEAN_PO_AFTER_BACKUP = True
 
+# Number of threads reading .po files for backup
+TRANSLATIONS_BACKUP_THREADS = 4
+
+# Backups retention used by prune_backups command.
+# Number of newest backups kept for every .po file, None keeps all
+TRANSLATIONS_BACKUP_KEEP_LAST = None
+# Backups older than given number of days are deleted, None keeps all.
+# The newest backup of every .po file is always kept.
+TRANSLATIONS_BACKUP_MAX_AGE = None
+
+# Timeout in seconds of translation state filter counts cached by
+# TRANSLATIONS_API_CACHE, counts are also refreshed when catalog version changes.
+TRANSLATIONS_STATE_COUNTS_CACHE_TIMEOUT = 60
+
 # Forced filters on changelist queryset.
 # Uses ORed original__contains Django ORM filter.
 # TRANSLATIONS_QUERYSET_FORCE_FILTERS = ['foo', 'bar']
 TRANSLATIONS_QUERYSET_FORCE_FILTERS = []
 
+# Mode of forced filters:
+# 'contains' matches originals containing any of filters (full table scan),
+# 'prefix' matches originals starting with any of filters using indexed
+# namespace column, e.g. ['admin-', 'front-'].
+TRANSLATIONS_FORCE_FILTERS_MODE = 'contains'
+
+# Namespace of original is its prefix up to and including the first of
+# separators, 'admin-foo-bar' => 'admin-'. Namespaces are stored when entries
+# are saved, existing entries are updated by migration only.
+TRANSLATIONS_NAMESPACE_SEPARATORS = ['-']
+
 # Language to display in hint column to help translators
-# see translation of string in another language
+# see translation of string in another language,
+# list of languages shows hints in all of them
 # TRANSLATIONS_HINT_LANGUAGE = 'foo'
+# TRANSLATIONS_HINT_LANGUAGE = ['foo', 'bar']
 TRANSLATIONS_HINT_LANGUAGE = ''
 
 # Relative path to locale dir with hint languages
@@ -118,6 +161,27 @@ TRANSLATIONS_API_QUERYSET_FORCE_FILTERS = []
 # If True, api returns all translations, it does not matter if it is filled with value translation
 TRANSLATIONS_API_RETURN_ALL = True
 
+# Cache alias used for api payloads and translations catalog version.
+# Payloads are cached until translations are compiled, loaded or edited,
+# responses get ETag and Last-Modified headers. If None, caching is disabled.
+TRANSLATIONS_API_CACHE = None
+
+# Timeout of cached api payloads in seconds, None caches them forever.
+TRANSLATIONS_API_CACHE_TIMEOUT = None
+
+# Content encodings of cached api payloads and static bundles precompressed
+# on write, 'br' requires brotli package.
+TRANSLATIONS_API_COMPRESSION = ['gzip', 'br']
+
+# Directory of static json bundles written on compile, served by web server
+# without Django. Bundles have the same content as translations api and
+# their filenames contain content hash, manifest.json maps languages to them.
+# If empty, no bundles are written.
+TRANSLATIONS_STATIC_BUNDLES_DIR = ''
+
+# Domains written also as separate bundles of every language, e.g. ['angularjs']
+TRANSLATIONS_STATIC_BUNDLES_DOMAINS = []
+
 # Permission classes for translation manager api methods.
 # If empty, no permission is provided
 TRANSLATIONS_API_PERMISSION_CLASSES = ()
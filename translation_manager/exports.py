@@ -0,0 +1,355 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+
+from itertools import groupby
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import get_cache, get_catalog_version, get_current_version, get_payload_key, get_version_datetime
+from .catalog import write_file
+from .models import TranslationEntry
+from .settings import get_settings
+from .utils import filter_queryset, get_filters_q, chunks
+
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# manifest replaced by the current one, its bundles are kept for clients still holding it
+PREVIOUS_MANIFEST_FILENAME = 'manifest.previous.json'
+
+BUNDLE_FILENAME_RE = re.compile(r'^[\w-]+(\.[\w-]+)?\.[0-9a-f]{8}\.json(\.gz|\.br)?$')
+
+# preferred content encodings first, with file extensions of static bundles
+ENCODINGS = (
+    ('br', '.br'),
+    ('gzip', '.gz'),
+)
+
+
+def filter_api_queryset(queryset):
+    "Returns entries of queryset exported by api"
+    queryset = filter_queryset(queryset, get_settings('TRANSLATIONS_API_QUERYSET_FORCE_FILTERS'))
+    if not get_settings('TRANSLATIONS_API_RETURN_ALL'):
+        queryset = queryset.exclude(Q(translation__isnull=True) | Q(translation__exact=''))
+    return queryset
+
+
+def get_api_queryset(language, domain=None):
+    """
+    Returns (original, translation) rows of language exported by api, ordered
+    by original. Rows with translation go first, so the first row of every
+    original wins.
+    """
+    queryset = TranslationEntry.objects.filter(language=language)
+    if domain is not None:
+        queryset = queryset.filter(domain=domain)
+    queryset = filter_api_queryset(queryset)
+    return queryset.order_by('original', '-translation').values_list('original', 'translation')
+
+
+def get_api_batch_queryset(languages, domains=None, prefixes=None):
+    """
+    Returns (language, original, translation) rows of languages exported by
+    api in a single query, ordered by language and original. Rows can be
+    limited to domains and originals starting with prefixes.
+    """
+    queryset = TranslationEntry.objects.filter(language__in=languages)
+    if domains:
+        queryset = queryset.filter(domain__in=domains)
+    if prefixes:
+        q = Q(original__startswith=prefixes[0])
+        for prefix in prefixes[1:]:
+            q = q | Q(original__startswith=prefix)
+        queryset = queryset.filter(q)
+    queryset = filter_api_queryset(queryset)
+    return queryset.order_by('language', 'original', '-translation').values_list('language', 'original', 'translation')
+
+
+def iter_translations_json(rows):
+    """
+    Yields utf-8 encoded json object of (original, translation) rows ordered
+    by original in chunks, duplicate originals are skipped. Rows are consumed
+    as they come, so the whole object is never held in memory.
+    """
+    yield b'{'
+    previous = None
+    separator = u''
+    for batch in chunks(rows, get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+        parts = []
+        for original, translation in batch:
+            if original == previous:
+                continue
+            previous = original
+            parts.append(u'%s%s:%s' % (separator, json.dumps(original), json.dumps(translation or u'')))
+            separator = u','
+        yield u''.join(parts).encode('utf-8')
+    yield b'}'
+
+
+def iter_language_json(language, domain=None):
+    "Yields json object of translations of language exported by api"
+    return iter_translations_json(get_api_queryset(language, domain=domain).iterator())
+
+
+def iter_batch_json(languages, domains=None, prefixes=None):
+    """
+    Yields json object of translations of languages exported by api
+    {"cs": {"original": "translation"}, "en": {}}, read by a single query.
+    """
+    rows = get_api_batch_queryset(languages, domains=domains, prefixes=prefixes).iterator()
+
+    yield b'{'
+    written = []
+    for language, language_rows in groupby(rows, key=lambda row: row[0]):
+        yield (u'%s%s:' % (u',' if written else u'', json.dumps(language))).encode('utf-8')
+        for chunk in iter_translations_json((original, translation) for lang, original, translation in language_rows):
+            yield chunk
+        written.append(language)
+    for language in languages:
+        if language not in written:
+            yield (u'%s%s:{}' % (u',' if written else u'', json.dumps(language))).encode('utf-8')
+            written.append(language)
+    yield b'}'
+
+
+def get_cached_payloads(language):
+    """
+    Returns payloads of language json by content encoding from cache, json
+    is built and cached for current catalog version if it is not cached yet.
+    Every language has a single key holding (version, payloads), so payloads
+    of stale versions are overwritten instead of piling up in the cache.
+    """
+    cache = get_cache()
+    key = get_payload_key(language)
+    version = get_catalog_version()
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    payloads = get_payloads(b''.join(iter_language_json(language)))
+    cache.set(key, (version, payloads), get_settings('TRANSLATIONS_API_CACHE_TIMEOUT'))
+    return payloads
+
+
+def parse_since(value):
+    """
+    Returns datetime of since parameter given as catalog version, unix
+    timestamp or ISO 8601 datetime, None if it is not valid.
+    """
+    if value.isdigit():
+        version = int(value)
+        if version < 10 ** 12:
+            # unix timestamp in seconds
+            version *= 1000000
+        try:
+            since = get_version_datetime(version)
+        except (ValueError, OverflowError, OSError):
+            return None
+    else:
+        try:
+            since = parse_datetime(value)
+        except ValueError:
+            return None
+        if since is None:
+            return None
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.utc)
+
+    if not settings.USE_TZ:
+        since = timezone.make_naive(since, timezone.get_default_timezone())
+    return since
+
+
+def get_api_delta(language, since):
+    """
+    Returns translations of language exported by api changed since datetime:
+
+    {"version": 1500000000000000, "changed": {"original": "translation"}, "removed": ["original"]}
+
+    Changed are originals added or edited since, removed are originals which
+    are not exported anymore, e.g. because they were unpublished. Version is
+    passed as since to get the next delta. Deleted entries are not tracked.
+    """
+    version = get_current_version()
+
+    entries = TranslationEntry.objects.filter(language=language, changed__gt=since)
+    forced_filters = get_settings('TRANSLATIONS_API_QUERYSET_FORCE_FILTERS')
+    if forced_filters:
+        entries = entries.filter(get_filters_q(forced_filters))
+    originals = dict(entries.values_list('original_hash', 'original').iterator())
+
+    changed = {}
+    for batch in chunks(sorted(originals), get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+        for original, translation in get_api_queryset(language).filter(original_hash__in=batch).iterator():
+            if original not in changed:
+                changed[original] = translation
+
+    return {
+        'version': version,
+        'changed': changed,
+        'removed': sorted(set(originals.values()).difference(changed)),
+    }
+
+
+def get_encodings():
+    "Returns content encodings of TRANSLATIONS_API_COMPRESSION available here"
+    encodings = get_settings('TRANSLATIONS_API_COMPRESSION')
+    return [encoding for encoding, extension in ENCODINGS
+            if encoding in encodings and (encoding != 'br' or brotli is not None)]
+
+
+def compress(content, encoding):
+    "Returns content compressed by gzip or br encoding"
+    if encoding == 'br':
+        return brotli.compress(content)
+    compressed = io.BytesIO()
+    # zero mtime keeps output of the same content the same
+    with gzip.GzipFile(fileobj=compressed, mode='wb', compresslevel=9, mtime=0) as gzip_file:
+        gzip_file.write(content)
+    return compressed.getvalue()
+
+
+def get_payloads(content):
+    """
+    Returns content with its precompressed forms by content encoding
+    {'identity': content, 'gzip': ..., 'br': ...}
+    """
+    payloads = {'identity': content}
+    for encoding in get_encodings():
+        payloads[encoding] = compress(content, encoding)
+    return payloads
+
+
+def get_accepted_encoding(accept_encoding, encodings):
+    """
+    Returns the most preferred of encodings accepted by Accept-Encoding header,
+    'identity' if none of them is accepted.
+    """
+    accepted = set()
+    for value in accept_encoding.split(','):
+        params = value.strip().split(';')
+        quality = 1.0
+        for param in params[1:]:
+            name, sep, number = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    pass
+        if quality > 0:
+            accepted.add(params[0].strip().lower())
+
+    for encoding, extension in ENCODINGS:
+        if encoding in encodings and (encoding in accepted or '*' in accepted):
+            return encoding
+    return 'identity'
+
+
+def write_bundle(path, name, content):
+    """
+    Writes json bundle named by its content hash, and its precompressed
+    .gz and .br forms. Returns the filename.
+    """
+    filename = '%s.%s.json' % (name, hashlib.sha1(content).hexdigest()[:8])
+    write_file(os.path.join(path, filename), content)
+    for encoding, extension in ENCODINGS:
+        if encoding in get_encodings():
+            write_file(os.path.join(path, filename + extension), compress(content, encoding))
+    return filename
+
+
+def get_api_signatures(languages):
+    """
+    Returns signatures of entries exported by api by language, signature
+    changes whenever entries are added, edited or deleted.
+    """
+    signatures = dict((language, u'0') for language in languages)
+    entries = filter_api_queryset(TranslationEntry.objects.filter(language__in=languages))
+    entries = entries.values('language').annotate(last_changed=Max('changed'), entry_count=Count('pk')).order_by()
+    for entry in entries:
+        signatures[entry['language']] = u'%s-%s' % (entry['entry_count'], entry['last_changed'].isoformat())
+    return signatures
+
+
+def read_manifest(path, filename=MANIFEST_FILENAME):
+    "Returns manifest of static bundles in path, empty if there is none"
+    try:
+        with open(os.path.join(path, filename), 'rb') as manifest_file:
+            return json.loads(manifest_file.read().decode('utf-8'))
+    except (IOError, ValueError):
+        return {}
+
+
+def get_manifest_filenames(manifest):
+    "Returns filenames of bundles referenced by manifest"
+    filenames = set()
+    for bundles in manifest.values():
+        filenames.add(bundles['file'])
+        filenames.update(bundles['domains'].values())
+    return filenames
+
+
+def write_static_bundles(path, languages, domains=(), full=False):
+    """
+    Writes json bundles of languages, and of their given domains, with the
+    same content as api returns, precompressed forms are named with .gz and
+    .br extension. Bundle filenames contain hash of their content, the
+    manifest maps languages to them:
+
+    {"cs": {"file": "cs.1a2b3c4d.json", "domains": {"angularjs": "cs.angularjs.5e6f7a8b.json"}, "signature": "..."}}
+
+    Bundles of languages whose exported entries did not change since the
+    current manifest are kept as they are, unless full is set. A replaced
+    manifest is kept as the previous one and bundles referenced by neither
+    of them are removed, so clients holding the previous manifest can still
+    fetch its bundles. Returns the manifest.
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    current_manifest = read_manifest(path)
+    signatures = get_api_signatures(languages)
+
+    manifest = {}
+    for language in languages:
+        current = current_manifest.get(language)
+        unchanged = current and current.get('signature') == signatures[language] and \
+            sorted(current['domains']) == sorted(domains)
+        filenames = get_manifest_filenames({language: current}) if unchanged else ()
+        if not full and unchanged and all(os.path.exists(os.path.join(path, filename)) for filename in filenames):
+            manifest[language] = current
+            continue
+        manifest[language] = {
+            'file': write_bundle(path, language, b''.join(iter_language_json(language))),
+            'domains': dict(
+                (domain, write_bundle(path, '%s.%s' % (language, domain),
+                                      b''.join(iter_language_json(language, domain=domain))))
+                for domain in domains
+            ),
+            'signature': signatures[language],
+        }
+
+    if current_manifest and current_manifest != manifest:
+        content = json.dumps(current_manifest, indent=2, sort_keys=True).encode('utf-8')
+        write_file(os.path.join(path, PREVIOUS_MANIFEST_FILENAME), content)
+    content = json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8')
+    write_file(os.path.join(path, MANIFEST_FILENAME), content)
+
+    filenames = get_manifest_filenames(manifest)
+    filenames.update(get_manifest_filenames(read_manifest(path, PREVIOUS_MANIFEST_FILENAME)))
+    for filename in os.listdir(path):
+        if BUNDLE_FILENAME_RE.match(filename) and re.sub(r'(\.gz|\.br)$', '', filename) not in filenames:
+            os.remove(os.path.join(path, filename))
+
+    return manifest
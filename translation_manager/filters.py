@@ -1,11 +1,53 @@
+import hashlib
+
 from django import VERSION
 from django.contrib import admin
+from django.db.models import Case, Count, IntegerField, Q, Value, When
 from django.utils.text import capfirst as cf
 from django.utils.translation import ugettext as _
 
+try:
+    from django.core.exceptions import EmptyResultSet
+except ImportError:
+    # django < 1.11
+    from django.db.models.sql.datastructures import EmptyResultSet
+
 from . import choices
+from .cache import get_cache, get_catalog_version
 from .settings import get_settings
 
+
+def get_state_counts(queryset):
+    """
+    Returns numbers of all and translated entries of queryset counted by
+    a single query. Counts are cached by TRANSLATIONS_API_CACHE for
+    TRANSLATIONS_STATE_COUNTS_CACHE_TIMEOUT seconds and current catalog version.
+    """
+    def count():
+        counts = queryset.order_by().aggregate(
+            all_count=Count('pk'),
+            translated_count=Count(Case(When(~Q(translation=''), then=Value(1)), output_field=IntegerField())),
+        )
+        return counts['all_count'], counts['translated_count']
+
+    cache = get_cache()
+    if cache is None:
+        return count()
+
+    try:
+        sql = str(queryset.order_by().query)
+    except EmptyResultSet:
+        return 0, 0
+
+    key = 'translation_manager:state_counts:%s:%s' % (
+        get_catalog_version(), hashlib.sha1(sql.encode('utf-8')).hexdigest())
+    counts = cache.get(key)
+    if counts is None:
+        counts = count()
+        cache.set(key, counts, get_settings('TRANSLATIONS_STATE_COUNTS_CACHE_TIMEOUT'))
+    return counts
+
+
 if (VERSION[0] == 1 and VERSION[1] >= 4) or VERSION[0] > 1:
     class TranslationStateFilter(admin.SimpleListFilter):
         title = _('admin-translation_manager-translation_state_filter-title')
@@ -18,8 +60,7 @@ if (VERSION[0] == 1 and VERSION[1] >= 4) or VERSION[0] > 1:
             )
 
         def queryset(self, request, queryset):
-            all_count = queryset.count()
-            translated_count = queryset.exclude(translation='').count()
+            all_count, translated_count = get_state_counts(queryset)
             untranslated_count = all_count - translated_count
 
             translated_title = u'{translated_label} ({translated_count} / {all_count})'.format(
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+from translation_manager.manager import Manager
+from translation_manager.signals import post_save
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', '-w', type=int, default=None, dest='workers',
+                            help='Number of processes compiling languages (default: TRANSLATIONS_COMPILE_WORKERS).')
+        parser.add_argument('--full', action='store_true', dest='full', default=False,
+                            help='Compiles all files, including the ones without changes since last compilation.')
+
+    def handle(self, *args, **options):
+        manager = Manager()
+        timings = manager.compile_translations(workers=options['workers'], full=options['full'])
+
+        if options['verbosity'] > 0:
+            for language, locale_path, domain, seconds, written, skipped in timings:
+                self.stdout.write("%s %s %s: %.3fs, %s written, %s unchanged" % (
+                    language, locale_path, domain, seconds, written, skipped))
+        self.stdout.write("Compiled %s catalogs in %.3fs, %s files written, %s unchanged" % (
+            len(timings),
+            sum(timing[3] for timing in timings),
+            sum(timing[4] for timing in timings),
+            sum(timing[5] for timing in timings),
+        ))
+
+        post_save.send(sender=None, request=None)
@@ -6,7 +6,13 @@ from django.core.management.base import BaseCommand
 class Command(BaseCommand):
     can_import_settings = True
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', '-w', type=int, default=None, dest='workers',
+                            help='Number of processes parsing po files (default: TRANSLATIONS_LOAD_WORKERS).')
+        parser.add_argument('--force', '-f', action='store_true', dest='force', default=False,
+                            help='Loads all po files, including the ones unchanged since last load.')
 
     def handle(self, *args, **options):
         manager = Manager()
-        manager.load_data_from_po()
\ No newline at end of file
+        published, unpublished = manager.load_data_from_po(workers=options['workers'], force=options['force'])
+        self.stdout.write("Published %s, unpublished %s entries" % (published, unpublished))
@@ -127,7 +127,9 @@ class Command(OriginCommand):
         try:
             from django.core.management.commands.makemessages import make_messages as old_make_messages
         except ImportError:
-            self.manager.postprocess()
+            published, unpublished = self.manager.postprocess()
+            if options['verbosity'] > 0:
+                self.stdout.write("Published %s, unpublished %s entries" % (published, unpublished))
 
     def find_files(self, root):
         if self.domain == 'angularjs':
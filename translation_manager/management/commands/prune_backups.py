@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+from translation_manager.manager import Manager
+from django.core.management.base import BaseCommand
+
+class Command(BaseCommand):
+    can_import_settings = True
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-last', type=int, default=None, dest='keep_last',
+                            help='Number of newest backups kept for every po file (default: TRANSLATIONS_BACKUP_KEEP_LAST).')
+        parser.add_argument('--max-age', type=int, default=None, dest='max_age',
+                            help='Deletes backups older than given number of days (default: TRANSLATIONS_BACKUP_MAX_AGE).')
+        parser.add_argument('--batch-size', type=int, default=None, dest='batch_size',
+                            help='Number of rows deleted in one transaction (default: TRANSLATIONS_BULK_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        manager = Manager()
+        backups, contents = manager.prune_backups(
+            keep_last=options['keep_last'],
+            max_age=options['max_age'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write("Deleted %s backups and %s unused backup contents" % (backups, contents))
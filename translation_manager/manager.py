@@ -2,234 +2,855 @@
 
 import codecs
 import os
-import polib
+import time
 
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import groupby
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 
 from django import VERSION
 from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
 
 from glob import glob
 
+from .cache import bump_catalog_version
+from .catalog import iter_po_entries, iter_po_entries_with_flags, format_po, format_mo, write_file
 from .choices import TRANSLATIONS_MODE_PROMISCUOUS
-from .models import TranslationEntry, TranslationBackup
-from .utils import get_relative_locale_path, get_locale_parent_dirname, get_dirname_from_lang, get_lang_from_dirname
+from .exports import write_static_bundles
+from .models import TranslationEntry, TranslationBackup, TranslationBackupContent, TranslationSourceFile, \
+    TranslationCompileState
+from .utils import get_relative_locale_path, get_locale_parent_dirname, get_dirname_from_lang, get_lang_from_dirname, \
+    bulk_update, chunks, get_file_hash, get_namespace, get_original_hash
 from .settings import get_settings
 
 
+def iter_pofile_messages(pofile, store_translations=False):
+    """
+    Yields messages of po file as (msgid, msgstr, occurrences) tuples one
+    by one, so the whole file is never held in memory.
+    """
+    for msgid, msgstr, occurrences in iter_po_entries(pofile):
+        occs = []
+        for occ in occurrences:
+            path = ":".join(occ)
+            occs.append(path)
+
+        if store_translations:
+            translation = msgstr
+        else:
+            translation = ""
+
+        yield msgid, translation, "\n".join(occs)
+
+
+def parse_pofile(pofile, store_translations=False):
+    """
+    Returns messages of po file as list of (msgid, msgstr, occurrences) tuples.
+    Module level function, so it can be used by worker processes.
+    """
+    return list(iter_pofile_messages(pofile, store_translations=store_translations))
+
+
+def read_pofile(pofile):
+    with codecs.open(pofile, 'r', 'utf-8') as pofile_opened:
+        return pofile_opened.read()
+
+
+def compile_language(job):
+    """
+    Updates po and mo files of (language, locale_params, units) job from db
+    and returns their timings. Module level function, so it can be used by
+    worker processes.
+    """
+    lang, locale_params, units = job
+    return Manager().update_po_from_db(lang=lang, locale_params=locale_params, units=units)
+
+
 class Manager(object):
 
     def __init__(self, *args, **kwargs):
         super(Manager, self).__init__(*args, **kwargs)
 
         self.tors = {}
+        self.skipped_units = set()
+        # (locale_path, language, domain) units whose entries were changed
+        self.changed_units = set()
+        self.loading = False
 
     def store_to_db(self, pofile, locale, store_translations=False):
         language = get_lang_from_dirname(locale)
         domain = os.path.splitext(os.path.basename(pofile))[0]
-        messages = polib.pofile(pofile)
-        translations = TranslationEntry.objects.filter(language=language)
-
-        tdict = {}
-        for t in translations:
-            if t.original not in tdict:
-                tdict.update({t.original: {}})
-            tdict[t.original][t.language] = t.translation
-
-        for m in messages:
-            occs = []
-            for occ in m.occurrences:
-                path = ":".join(occ)
-                occs.append(path)
-
-            if store_translations:
-                translation = m.msgstr
-            else:
-                translation = ""
-
-            locale_path = get_relative_locale_path(pofile)
-
-            if os.path.split(pofile)[-1] == 'angularjs.po':
-                locale_dir_name = ''
-            else:
-                locale_dir_name = get_locale_parent_dirname(pofile)
-            t, created = TranslationEntry.objects.get_or_create(
-                original=m.msgid,
-                language=language,
-                locale_path=locale_path,
-                domain=domain,
-                defaults={
-                    "occurrences": "\n".join(occs),
-                    "translation": translation,
-                    "locale_parent_dir": locale_dir_name,
-                    "is_published": True,
-                }
-            )
-
-            if locale_path not in self.tors:
-                self.tors[locale_path] = {}
-            if language not in self.tors[locale_path]:
-                self.tors[locale_path][language] = {}
-            if domain not in self.tors[locale_path][language]:
-                self.tors[locale_path][language][domain] = []
-            self.tors[locale_path][language][domain].append(t.original)
+        messages = iter_pofile_messages(pofile, store_translations=store_translations)
+        self.store_messages_to_db(pofile, language, domain, messages)
+
+    def store_messages_to_db(self, pofile, language, domain, messages, overwrite_translations=False):
+        """
+        Stores (msgid, msgstr, occurrences) tuples of one po file to db.
+
+        Existing entries of the file are read in a single query, new entries
+        are written by batched bulk_create and entries with changed occurrences
+        by batched bulk update, so the number of queries does not depend on
+        the number of messages in the file. Translations of existing entries
+        are updated only if overwrite_translations is set.
+        """
+        locale_path = get_relative_locale_path(pofile)
+
+        if os.path.split(pofile)[-1] == 'angularjs.po':
+            locale_dir_name = ''
+        else:
+            locale_dir_name = get_locale_parent_dirname(pofile)
+
+        batch_size = get_settings('TRANSLATIONS_BULK_BATCH_SIZE')
+
+        existing = {}
+        existing_entries = TranslationEntry.objects.filter(
+            language=language,
+            locale_path=locale_path,
+            domain=domain
+        ).order_by('pk').values_list('pk', 'original_hash', 'occurrences', 'locale_parent_dir', 'translation')
+        for pk, original_hash, occurrences, locale_parent_dir, translation in existing_entries.iterator():
+            if original_hash not in existing:
+                existing[original_hash] = (pk, occurrences, locale_parent_dir, translation)
+
+        if locale_path not in self.tors:
+            self.tors[locale_path] = {}
+        if language not in self.tors[locale_path]:
+            self.tors[locale_path][language] = {}
+        if domain not in self.tors[locale_path][language]:
+            self.tors[locale_path][language][domain] = set()
+        tors = self.tors[locale_path][language][domain]
+
+        update_fields = ['occurrences', 'locale_parent_dir', 'changed']
+        if overwrite_translations:
+            update_fields.append('translation')
+
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        seen = set()
+
+        with transaction.atomic():
+            for msgid, msgstr, occurrences in messages:
+                original_hash = get_original_hash(msgid)
+                tors.add(original_hash)
+
+                if original_hash in seen:
+                    continue
+                seen.add(original_hash)
+
+                current = existing.get(original_hash)
+                if current is None:
+                    self.changed_units.add((locale_path, language, domain))
+                    to_create.append(TranslationEntry(
+                        original=msgid,
+                        original_hash=original_hash,
+                        namespace=get_namespace(msgid),
+                        language=language,
+                        locale_path=locale_path,
+                        domain=domain,
+                        occurrences=occurrences,
+                        translation=msgstr,
+                        locale_parent_dir=locale_dir_name,
+                        is_published=True,
+                    ))
+                elif current[1:3] != (occurrences, locale_dir_name) or (
+                        overwrite_translations and current[3] != msgstr):
+                    self.changed_units.add((locale_path, language, domain))
+                    to_update.append(TranslationEntry(
+                        pk=current[0],
+                        occurrences=occurrences,
+                        locale_parent_dir=locale_dir_name,
+                        translation=msgstr if overwrite_translations else current[3],
+                        changed=now,
+                    ))
+
+                if len(to_create) >= batch_size:
+                    self.create_entries(to_create)
+                    to_create = []
+                if len(to_update) >= batch_size:
+                    bulk_update(TranslationEntry, to_update, update_fields)
+                    to_update = []
+
+            if to_create:
+                self.create_entries(to_create)
+            if to_update:
+                bulk_update(TranslationEntry, to_update, update_fields)
+
+    def create_entries(self, entries):
+        """
+        Creates entries by bulk_create. If any of them was created meanwhile
+        by another process, entries are created one by one and the existing
+        ones are skipped. Returns number of created entries.
+        """
+        try:
+            with transaction.atomic():
+                TranslationEntry.objects.bulk_create(entries, batch_size=get_settings('TRANSLATIONS_BULK_BATCH_SIZE'))
+            return len(entries)
+        except IntegrityError:
+            created_count = 0
+            for entry in entries:
+                entry.pk = None
+                try:
+                    with transaction.atomic():
+                        entry.save()
+                    created_count += 1
+                except IntegrityError:
+                    pass
+            return created_count
 
     ############################################################################
 
     def backup_po_to_db(self):
-        """ Backup Po file to db model """
-
-
+        """
+        Backup Po file to db model. Backup is skipped if the latest backup of
+        the file has the same content, equal contents are stored only once.
+
+        Files are read by a pool of threads and all backups are stored in one
+        transaction, files are cleaned only after it is committed.
+        """
+        pofiles = []
         for lang, lang_name in settings.LANGUAGES:
             for path in settings.LOCALE_PATHS:
                 po_pattern = os.path.join(path, get_dirname_from_lang(lang), "LC_MESSAGES", "*.po")
                 for pofile in glob(po_pattern):
                     if settings.DEBUG:
                         print ("Backuping", pofile)
+                    pofiles.append((lang, pofile))
+
+        if not pofiles:
+            return
+
+        pool = ThreadPool(min(get_settings('TRANSLATIONS_BACKUP_THREADS'), len(pofiles)))
+        try:
+            contents = pool.map(read_pofile, [pofile for lang, pofile in pofiles])
+        finally:
+            pool.close()
+            pool.join()
+
+        latest_ids = TranslationBackup.objects.filter(
+            language__in=set(lang for lang, pofile in pofiles)
+        ).values('language', 'locale_path', 'domain').annotate(latest_id=Max('pk')).order_by()
+        latest_hashes = {}
+        for backup in TranslationBackup.objects.filter(
+            pk__in=[latest['latest_id'] for latest in latest_ids]
+        ).values_list('language', 'locale_path', 'domain', 'stored_content__content_hash'):
+            latest_hashes[backup[:3]] = backup[3]
+
+        backups = []
+        for (lang, pofile), content in zip(pofiles, contents):
+            domain = os.path.splitext(os.path.basename(pofile))[0]
+            locale_path = get_relative_locale_path(pofile)
+            content_hash = TranslationBackupContent.get_hash(content)
+            if latest_hashes.get((lang, locale_path, domain)) != content_hash:
+                backups.append((TranslationBackup(
+                    language=lang,
+                    locale_path=locale_path,
+                    domain=domain,
+                    locale_parent_dir=get_locale_parent_dirname(pofile),
+                ), content_hash, content))
+
+        with transaction.atomic():
+            stored_contents = TranslationBackupContent.get_or_create_many(
+                dict((content_hash, content) for backup, content_hash, content in backups))
+            for backup, content_hash, content in backups:
+                backup.stored_content = stored_contents[content_hash]
+            TranslationBackup.objects.bulk_create([backup for backup, content_hash, content in backups])
+
+        if get_settings('TRANSLATIONS_CLEAN_PO_AFTER_BACKUP'):
+            for lang, pofile in pofiles:
+                with open(pofile, 'w') as pofile_opened:
+                    pofile_opened.write('')
+
+    def restore_backups(self, backups, reimport=False):
+        """
+        Restores po and mo files from backups. Only the newest of given backups
+        of each (language, locale_path, domain) is restored, contents of all of
+        them are read in a single query and every file is written atomically.
+        If reimport is set, restored messages and their translations are also
+        stored to db.
+
+        Returns restored (language, locale_path, domain) tuples.
+        """
+        latest = {}
+        for backup in backups:
+            unit = (backup.language, backup.locale_path, backup.domain)
+            if unit not in latest or (backup.created, backup.pk) > (latest[unit].created, latest[unit].pk):
+                latest[unit] = backup
+
+        contents = TranslationBackupContent.objects.in_bulk(
+            [backup.stored_content_id for backup in latest.values() if backup.stored_content_id])
+
+        metadata = self.get_catalog_metadata()
+
+        for (language, locale_path, domain), backup in sorted(latest.items()):
+            lc_messages_path = os.path.abspath(os.path.join(
+                get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(language), 'LC_MESSAGES'))
+            if not os.path.isdir(lc_messages_path):
+                os.makedirs(lc_messages_path)
+
+            pofile_path = os.path.join(lc_messages_path, "%s.po" % domain)
+            mofile_path = os.path.join(lc_messages_path, "%s.mo" % domain)
+
+            stored_content = contents.get(backup.stored_content_id)
+            content = stored_content.get_content() if stored_content else u''
+
+            write_file(pofile_path, content.encode('utf-8'))
+            # fuzzy and obsolete entries are not compiled, as by msgfmt
+            entries = iter_po_entries_with_flags(pofile_path)
+            write_file(mofile_path, format_mo(metadata, [
+                (msgid, msgstr) for msgid, msgstr, occurrences, fuzzy, obsolete in entries
+                if msgstr and not fuzzy and not obsolete]))
+
+            if reimport:
+                self.store_messages_to_db(pofile_path, language, domain,
+                                          iter_pofile_messages(pofile_path, store_translations=True),
+                                          overwrite_translations=True)
+        if reimport and latest:
+            self.forget_source_files()
+            bump_catalog_version()
+
+        return sorted(latest)
+
+    def prune_backups(self, keep_last=None, max_age=None, batch_size=None):
+        """
+        Deletes backups beyond keep_last newest ones of each (language,
+        locale_path, domain) and backups older than max_age days. The newest
+        backup of each file is always kept. Backups and unused contents are
+        deleted in batches, each in its own transaction.
+
+        Returns numbers of deleted backups and contents.
+        """
+        keep_last = keep_last or get_settings('TRANSLATIONS_BACKUP_KEEP_LAST')
+        max_age = max_age or get_settings('TRANSLATIONS_BACKUP_MAX_AGE')
+        batch_size = batch_size or get_settings('TRANSLATIONS_BULK_BATCH_SIZE')
+
+        if not keep_last and not max_age:
+            return 0, 0
+
+        oldest = timezone.now() - timedelta(days=max_age) if max_age else None
+
+        to_delete = []
+        unit = None
+        position = 0
+        backups = TranslationBackup.objects.order_by('language', 'locale_path', 'domain', '-created', '-pk').values_list(
+            'pk', 'language', 'locale_path', 'domain', 'created')
+        for pk, language, locale_path, domain, created in backups.iterator():
+            if unit != (language, locale_path, domain):
+                unit = (language, locale_path, domain)
+                position = 0
+            else:
+                position += 1
+                if (keep_last and position >= keep_last) or (oldest and created < oldest):
+                    to_delete.append(pk)
 
-                    domain = os.path.splitext(os.path.basename(pofile))[0]
-                    with codecs.open(pofile, 'r', 'utf-8') as pofile_opened:
-                        content = pofile_opened.read()
-                        backup = TranslationBackup(
-                            language=lang,
-                            locale_path=get_relative_locale_path(pofile),
-                            domain=domain,
-                            locale_parent_dir=get_locale_parent_dirname(pofile),
-                            content=content,
-                        )
-                        backup.save()
+        for batch in chunks(to_delete, batch_size):
+            with transaction.atomic():
+                TranslationBackup.objects.filter(pk__in=batch).delete()
 
-                    if get_settings('TRANSLATIONS_CLEAN_PO_AFTER_BACKUP'):
-                        with open(pofile, 'w') as pofile_opened:
-                            pofile_opened.write('')
+        unused = list(TranslationBackupContent.objects.filter(translationbackup__isnull=True).values_list('pk', flat=True))
+        for batch in chunks(unused, batch_size):
+            with transaction.atomic():
+                TranslationBackupContent.objects.filter(pk__in=batch).delete()
 
+        return len(to_delete), len(unused)
 
     ############################################################################
 
 
-    def update_po_from_db(self, lang):
+    def get_locale_params(self):
+        "Returns sorted (locale_path, domain) pairs of published entries of all languages"
+        locale_params = TranslationEntry.objects.filter(is_published=True)
+
+        forced_locale_paths = get_settings('TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS')
+        if forced_locale_paths:
+            locale_params = locale_params.filter(locale_path__in=forced_locale_paths)
+
+        locale_params = locale_params.order_by('locale_path', 'domain').values_list('locale_path', 'domain').distinct()
+        return list(locale_params)
+
+    def compile_translations(self, workers=None, full=False):
+        """
+        Updates po and mo files of all languages from db. With more than one
+        worker languages are compiled by a pool of processes, unless it is
+        called inside a transaction.
+
+        Only files with entries changed since their last compilation are
+        updated, unless full is set. Static json bundles are written too if
+        TRANSLATIONS_STATIC_BUNDLES_DIR is set.
+
+        Returns list of (language, locale_path, domain, seconds, written, skipped)
+        timings of compiled files.
+        """
+        workers = workers or get_settings('TRANSLATIONS_COMPILE_WORKERS')
+        languages = [language for language, language_name in settings.LANGUAGES]
+
+        last_changes, states = self.get_compile_states(languages)
+        # files compiled before are rewritten even if they lost all published entries
+        locale_params = sorted(set(self.get_locale_params()).union(
+            (locale_path, domain) for language, locale_path, domain in states))
+
+        units = {}
+        for language in languages:
+            units[language] = set()
+            for locale_path, domain in locale_params:
+                unit = (language, locale_path, domain)
+                if full or self.is_dirty(unit, last_changes.get(unit, (None, 0)), states.get(unit)):
+                    units[language].add((locale_path, domain))
+        languages = [language for language in languages if units[language]]
+
+        # closing connections would break transaction of the caller, so it
+        # is compiled by this process only
+        in_atomic_block = any(connection.in_atomic_block for connection in connections.all())
+
+        timings = []
+        if workers > 1 and len(languages) > 1 and not in_atomic_block:
+            # every process has to open its own db connection
+            for connection in connections.all():
+                connection.close()
+
+            pool = Pool(min(workers, len(languages)))
+            try:
+                jobs = [(language, locale_params, units[language]) for language in languages]
+                for language_timings in pool.imap_unordered(compile_language, jobs):
+                    timings.extend(language_timings)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for language in languages:
+                timings.extend(self.update_po_from_db(lang=language, locale_params=locale_params,
+                                                      units=units[language]))
+
+        self.save_compile_states(timings, last_changes, states)
+        if timings:
+            bump_catalog_version()
+
+        bundles_dir = get_settings('TRANSLATIONS_STATIC_BUNDLES_DIR')
+        if bundles_dir:
+            # bundles are rewritten by changes of api data, which may be outside of compiled files
+            write_static_bundles(bundles_dir, [language for language, language_name in settings.LANGUAGES],
+                                 get_settings('TRANSLATIONS_STATIC_BUNDLES_DOMAINS'), full=full)
+
+        return timings
+
+    def get_compile_states(self, languages):
+        """
+        Returns (newest change, number) of entries and compile states of files
+        by (language, locale_path, domain).
+        """
+        entries = TranslationEntry.objects.filter(language__in=languages)
+        compile_states = TranslationCompileState.objects.filter(language__in=languages)
+
+        forced_locale_paths = get_settings('TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS')
+        if forced_locale_paths:
+            entries = entries.filter(locale_path__in=forced_locale_paths)
+            compile_states = compile_states.filter(locale_path__in=forced_locale_paths)
+
+        last_changes = {}
+        entries = entries.values('language', 'locale_path', 'domain').annotate(
+            last_changed=Max('changed'), entry_count=Count('pk')).order_by()
+        for entry in entries:
+            last_changes[(entry['language'], entry['locale_path'], entry['domain'])] = (
+                entry['last_changed'], entry['entry_count'])
+
+        states = {}
+        for state in compile_states:
+            states[(state.language, state.locale_path, state.domain)] = state
+
+        return last_changes, states
+
+    def is_dirty(self, unit, last_change, state):
+        "Returns True if file was never compiled, is missing or has entries changed or deleted since"
+        if state is None:
+            return True
+        last_changed, entry_count = last_change
+        if last_changed is not None and (state.last_changed is None or last_changed > state.last_changed):
+            return True
+        if entry_count != state.entry_count:
+            return True
+        language, locale_path, domain = unit
+        mofile_path = os.path.join(get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(language),
+                                   'LC_MESSAGES', "%s.mo" % domain)
+        return not os.path.exists(mofile_path)
+
+    def save_compile_states(self, timings, last_changes, states):
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for timing in timings:
+            unit = language, locale_path, domain = timing[:3]
+            last_changed, entry_count = last_changes.get(unit, (None, 0))
+            state = states.get(unit)
+            if state is None:
+                to_create.append(TranslationCompileState(
+                    language=language,
+                    locale_path=locale_path,
+                    domain=domain,
+                    last_changed=last_changed,
+                    entry_count=entry_count,
+                ))
+            else:
+                state.last_changed = last_changed
+                state.entry_count = entry_count
+                state.compiled = now
+                to_update.append(state)
+
+        TranslationCompileState.objects.bulk_create(to_create)
+        bulk_update(TranslationCompileState, to_update, ['last_changed', 'entry_count', 'compiled'])
+
+    def update_po_from_db(self, lang, locale_params=None, units=None):
+        """
+        Updates po and mo files of language from db.
+
+        Translations are read by a single query ordered by file and written
+        file by file as they come, files of locale_params without any
+        translation are written empty. If units are given, only those
+        (locale_path, domain) files are written. Returns timings of compiled
+        files.
+        """
+        if locale_params is None:
+            locale_params = self.get_locale_params()
+        if units is None:
+            units = set(locale_params)
 
         translations = TranslationEntry.objects.filter(
             language=lang,
             is_published=True
         ).exclude(
             translation=""
-        ).order_by("original")
-
-        locale_params = TranslationEntry.objects.filter(is_published=True).order_by('locale_path', 'domain')
+        ).order_by('locale_path', 'domain', 'original')
 
         forced_locale_paths = get_settings('TRANSLATIONS_UPDATE_FORCED_LOCALE_PATHS')
         if forced_locale_paths:
             translations = translations.filter(locale_path__in=forced_locale_paths)
-            locale_params = locale_params.filter(locale_path__in=forced_locale_paths)
 
-        locale_params = locale_params.values_list('locale_path', 'domain')
-        locale_params = list(set(locale_params))
+        if len(units) < len(locale_params):
+            translations = translations.filter(
+                locale_path__in=set(locale_path for locale_path, domain in units),
+                domain__in=set(domain for locale_path, domain in units),
+            )
 
-        for locale_path, domain in locale_params:
-            lang_dir_path = os.path.abspath(
-                os.path.join(get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(lang)))
-            if not os.path.isdir(lang_dir_path):
-                os.mkdir(lang_dir_path)
-                os.mkdir(os.path.join(lang_dir_path, 'LC_MESSAGES'))
-
-            pofile_path = os.path.join(get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(lang),
-                                       'LC_MESSAGES',
-                                               "%s.po" % domain)
-            mofile_path = os.path.join(get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(lang),
-                                       'LC_MESSAGES',
-                                               "%s.mo" % domain)
+        translations = translations.values_list('locale_path', 'domain', 'original', 'translation', 'occurrences')
+
+        timings = []
+        started = time.time()
 
+        rows = groupby(translations.iterator(), key=lambda row: (row[0], row[1]))
+        for (locale_path, domain), entries in rows:
+            if (locale_path, domain) not in units:
+                continue
+            written, skipped = self.write_catalog(lang, locale_path, domain, [entry[2:] for entry in entries])
+            finished = time.time()
+            timings.append((lang, locale_path, domain, finished - started, written, skipped))
+            started = finished
+
+        compiled = set(timing[1:3] for timing in timings)
+        for locale_path, domain in locale_params:
+            if (locale_path, domain) in units and (locale_path, domain) not in compiled:
+                written, skipped = self.write_catalog(lang, locale_path, domain, [])
+                finished = time.time()
+                timings.append((lang, locale_path, domain, finished - started, written, skipped))
+                started = finished
+
+        return timings
+
+    def get_catalog_metadata(self):
+        now = datetime.now()
+        return [
+            ('Project-Id-Version', '0.1'),
+            ('Report-Msgid-Bugs-To', '%s' % settings.DEFAULT_FROM_EMAIL),
+            ('POT-Creation-Date', now.strftime("%Y-%m-%d %H:%M:%S")),
+            ('PO-Revision-Date', now.strftime("%Y-%m-%d %H:%M:%S")),
+            ('Last-Translator', 'Server <%s>' % settings.SERVER_EMAIL),
+            ('Language-Team', 'English <%s>' % settings.DEFAULT_FROM_EMAIL),
+            ('MIME-Version', '1.0'),
+            ('Content-Type', 'text/plain; charset=utf-8'),
+            ('Content-Transfer-Encoding', '8bit'),
+        ]
+
+    def write_catalog(self, lang, locale_path, domain, entries):
+        """
+        Writes mo file, and po file if TRANSLATIONS_COMPILE_PO_FILES is set,
+        straight from (original, translation, occurrences) tuples. Files with
+        unchanged content are not rewritten. Returns numbers of written and
+        skipped files.
+        """
+        lang_dir_path = os.path.abspath(
+            os.path.join(get_settings('TRANSLATIONS_BASE_DIR'), locale_path, get_dirname_from_lang(lang)))
+        if not os.path.isdir(os.path.join(lang_dir_path, 'LC_MESSAGES')):
+            os.makedirs(os.path.join(lang_dir_path, 'LC_MESSAGES'))
+
+        pofile_path = os.path.join(lang_dir_path, 'LC_MESSAGES', "%s.po" % domain)
+        mofile_path = os.path.join(lang_dir_path, 'LC_MESSAGES', "%s.mo" % domain)
+
+        metadata = self.get_catalog_metadata()
+        written = skipped = 0
+
+        if get_settings('TRANSLATIONS_COMPILE_PO_FILES'):
             if not os.path.exists(pofile_path):
                 if settings.DEBUG:
                     print ("Po file '%s' does't exists, it will be created" % pofile_path)
 
-            now = datetime.now()
-            pofile = polib.POFile()
-            pofile.metadata = {
-                'Project-Id-Version': '0.1',
-                'Report-Msgid-Bugs-To': '%s' % settings.DEFAULT_FROM_EMAIL,
-                'POT-Creation-Date': now.strftime("%Y-%m-%d %H:%M:%S"),
-                'PO-Revision-Date': now.strftime("%Y-%m-%d %H:%M:%S"),
-                'Last-Translator': 'Server <%s>' % settings.SERVER_EMAIL,
-                'Language-Team': 'English <%s>' % settings.DEFAULT_FROM_EMAIL,
-                'MIME-Version': '1.0',
-                'Content-Type': 'text/plain; charset=utf-8',
-                'Content-Transfer-Encoding': '8bit',
-            }
-
-            for translation in translations.filter(locale_path=locale_path, domain=domain):
-                entry = polib.POEntry(
-                    msgid=translation.original,
-                    msgstr=translation.translation,
-                    occurrences=[occ.split(":") for occ in translation.occurrences.split()]
-                )
-                pofile.append(entry)
-
-            pofile.save(pofile_path)
-            pofile.save_as_mofile(mofile_path)
+            if write_file(pofile_path, format_po(metadata, entries).encode('utf-8')):
+                written += 1
+            else:
+                skipped += 1
+
+        mo_content = format_mo(metadata, [(original, translation) for original, translation, occurrences in entries])
+        if write_file(mofile_path, mo_content):
+            written += 1
+        else:
+            skipped += 1
+
+        return written, skipped
 
     ############################################################################
 
     def postprocess(self):
-        TranslationEntry.objects.all().update(is_published=False)
+        published_count, unpublished_count = self.reconcile_published()
+
+        if get_settings('TRANSLATIONS_MODE') == TRANSLATIONS_MODE_PROMISCUOUS:
+            published_count += self.replicate_promiscuous()
+
+        self.forget_source_files()
+        bump_catalog_version()
+        return published_count, unpublished_count
+
+    def reconcile_published(self):
+        """
+        Publishes entries collected from po files and unpublishes all the others.
+        In promiscuous mode entries are published in all locale paths.
+
+        Only entries whose state actually changes are updated, by chunks of
+        primary keys. Returns numbers of published and unpublished entries.
+        """
+        if self.skipped_units:
+            # published entries of skipped unchanged po files count as collected
+            published = TranslationEntry.objects.filter(is_published=True).values_list(
+                'locale_path', 'language', 'domain', 'original_hash')
+            for locale_path, language, domain, original_hash in published.iterator():
+                if (locale_path, language, domain) in self.skipped_units:
+                    self.tors[locale_path][language][domain].add(original_hash)
+
+        collected = {}
         for locale_path, languages in self.tors.items():
-            TranslationEntry.objects.filter(locale_path=locale_path).update(is_published=False)
             for language, domains in languages.items():
                 for domain, tors in domains.items():
-                    tors = list(set(tors))
-                    TranslationEntry.objects.filter(
-                        locale_path=locale_path,
+                    collected[(locale_path, language, domain)] = tors
+
+        promiscuous = get_settings('TRANSLATIONS_MODE') == TRANSLATIONS_MODE_PROMISCUOUS
+        if promiscuous:
+            all_tors = set()
+            for tors in collected.values():
+                all_tors.update(tors)
+
+        to_publish = []
+        to_unpublish = []
+        entries = TranslationEntry.objects.values_list(
+            'pk', 'locale_path', 'language', 'domain', 'original_hash', 'is_published')
+        for pk, locale_path, language, domain, original_hash, is_published in entries.iterator():
+            if promiscuous:
+                should_publish = original_hash in all_tors
+            else:
+                collected_tors = collected.get((locale_path, language, domain))
+                should_publish = collected_tors is not None and original_hash in collected_tors
+            if should_publish and not is_published:
+                to_publish.append(pk)
+                self.changed_units.add((locale_path, language, domain))
+            elif is_published and not should_publish:
+                to_unpublish.append(pk)
+                self.changed_units.add((locale_path, language, domain))
+
+        self.set_published(to_publish, True)
+        self.set_published(to_unpublish, False)
+        return len(to_publish), len(to_unpublish)
+
+    def replicate_promiscuous(self):
+        """
+        Creates every published entry in all locale paths where it is missing.
+
+        Missing entries are the difference between existing and required
+        (original_hash, language, locale_path, domain) keys and are written by
+        batched bulk_create. Returns number of created entries.
+        """
+        if VERSION[:2] in [(1, 2), (1, 3)]:
+            locale_paths = [os.path.relpath(path, get_settings('TRANSLATIONS_BASE_DIR')) for path in settings.LOCALE_PATHS]
+        else:
+            locale_paths = list(self.tors.keys())
+
+        batch_size = get_settings('TRANSLATIONS_BULK_BATCH_SIZE')
+
+        existing = set(TranslationEntry.objects.values_list('original_hash', 'language', 'locale_path', 'domain').iterator())
+
+        locale_parent_dirs = {}
+        created_count = 0
+        to_create = []
+
+        published = TranslationEntry.objects.filter(is_published=True).order_by(
+            "original", 'language', 'locale_path'
+        ).values_list('original', 'original_hash', 'language', 'domain', 'occurrences', 'translation')
+
+        with transaction.atomic():
+            for original, original_hash, language, domain, occurrences, translation in published.iterator():
+                for locale_path in locale_paths:
+                    key = (original_hash, language, locale_path, domain)
+                    if key in existing:
+                        continue
+                    existing.add(key)
+                    self.changed_units.add((locale_path, language, domain))
+
+                    if (locale_path, language) not in locale_parent_dirs:
+                        locale_parent_dirs[(locale_path, language)] = get_locale_parent_dirname(
+                            os.path.join(
+                                get_settings('TRANSLATIONS_BASE_DIR'),
+                                locale_path,
+                                get_dirname_from_lang(language),
+                                'LC_MESSAGES',
+                                "django.po"
+                            )
+                        )
+
+                    to_create.append(TranslationEntry(
+                        original=original,
+                        original_hash=original_hash,
+                        namespace=get_namespace(original),
                         language=language,
+                        locale_path=locale_path,
                         domain=domain,
-                        original__in=tors
-                    ).update(is_published=True)
+                        occurrences=occurrences,
+                        translation=translation,
+                        locale_parent_dir=locale_parent_dirs[(locale_path, language)],
+                        is_published=True,
+                    ))
+                    if len(to_create) >= batch_size:
+                        created_count += self.create_entries(to_create)
+                        to_create = []
 
-        if get_settings('TRANSLATIONS_MODE') == TRANSLATIONS_MODE_PROMISCUOUS:
-            published = TranslationEntry.objects.filter(is_published=True).order_by("original", 'language', 'locale_path')
-            for trans in published:
-                if VERSION[:2] in [(1, 2), (1, 3)]:
-                    locale_paths = [os.path.relpath(path, get_settings('TRANSLATIONS_BASE_DIR')) for path in settings.LOCALE_PATHS]
-                else:
-                    locale_paths = self.tors.keys()
+            if to_create:
+                created_count += self.create_entries(to_create)
 
-                for locale_path in locale_paths:
-                    locale_parent_dir = get_locale_parent_dirname(
-                        os.path.join(
-                            get_settings('TRANSLATIONS_BASE_DIR'),
-                            locale_path,
-                            get_dirname_from_lang(trans.language),
-                            'LC_MESSAGES',
-                            "django.po"
-                        )
-                    )
+        return created_count
 
-                    t, created = TranslationEntry.objects.get_or_create(
-                        original=trans.original,
-                        language=trans.language,
-                        locale_path=locale_path,
-                        domain=trans.domain,
-                        defaults={
-                            "occurrences": trans.occurrences,
-                            "translation": trans.translation,
-                            "locale_parent_dir": locale_parent_dir,
-                            "is_published": True,
-                        }
-                    )
-            TranslationEntry.objects.filter(original__in=published.values_list('original', flat=True)).update(is_published=True)
+    def set_published(self, pks, is_published):
+        now = timezone.now()
+        for chunk in chunks(pks, get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+            TranslationEntry.objects.filter(pk__in=chunk).update(is_published=is_published, changed=now)
 
     ############################################################################
 
-    def load_data_from_po(self):
-        import os
+    def load_data_from_po(self, workers=None, force=False):
+        """
+        Loads all po files to db. With more than one worker po files are
+        parsed by a pool of processes and stored to db by this process.
 
+        Po files unchanged since last load are skipped unless force is set,
+        their entries stay published as they are.
+        """
+        workers = workers or get_settings('TRANSLATIONS_LOAD_WORKERS')
+
+        pofiles = []
         for lang, lang_name in settings.LANGUAGES:
             for path in settings.LOCALE_PATHS:
                 locale = get_dirname_from_lang(lang)
                 po_pattern = os.path.join(path, locale, "LC_MESSAGES", "*.po")
                 for pofile in glob(po_pattern):
+                    pofiles.append((pofile, locale))
+
+        pofiles, fingerprints = self.filter_changed_pofiles(pofiles, force=force)
+
+        self.loading = True
+        try:
+            result = self.store_pofiles(pofiles, workers)
+        finally:
+            self.loading = False
+            self.changed_units = set()
+
+        for fingerprint in fingerprints:
+            fingerprint.save()
+
+        return result
+
+    def store_pofiles(self, pofiles, workers):
+        "Stores (pofile, locale) pairs to db and postprocesses them"
+        if workers > 1 and len(pofiles) > 1:
+            pool = Pool(min(workers, len(pofiles)))
+            try:
+                parsed = pool.imap(partial(parse_pofile, store_translations=True), [pofile for pofile, locale in pofiles])
+                for (pofile, locale), messages in zip(pofiles, parsed):
                     if settings.DEBUG:
                         print ("processing pofile", pofile)
-                    self.store_to_db(pofile=pofile, locale=locale, store_translations=True)
-
-        self.postprocess()
+                    language = get_lang_from_dirname(locale)
+                    domain = os.path.splitext(os.path.basename(pofile))[0]
+                    self.store_messages_to_db(pofile, language, domain, messages)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            for pofile, locale in pofiles:
+                if settings.DEBUG:
+                    print ("processing pofile", pofile)
+                self.store_to_db(pofile=pofile, locale=locale, store_translations=True)
+
+        return self.postprocess()
+
+    def filter_changed_pofiles(self, pofiles, force=False):
+        """
+        Returns (pofile, locale) pairs changed since last load and fingerprints
+        to save after they are loaded. Files are compared by mtime and size
+        first and by content hash only if those differ.
+        """
+        fingerprints = dict((fingerprint.path, fingerprint) for fingerprint in TranslationSourceFile.objects.all())
+
+        changed = []
+        to_save = []
+        for pofile, locale in pofiles:
+            path = os.path.relpath(pofile, get_settings('TRANSLATIONS_BASE_DIR'))
+            stat = os.stat(pofile)
+            fingerprint = fingerprints.get(path)
+
+            if fingerprint is None:
+                fingerprint = TranslationSourceFile(path=path)
+            elif not force and fingerprint.mtime == stat.st_mtime and fingerprint.size == stat.st_size:
+                self.skip_pofile(pofile, locale)
+                continue
+
+            content_hash = get_file_hash(pofile)
+            unchanged = fingerprint.content_hash == content_hash
+
+            fingerprint.mtime = stat.st_mtime
+            fingerprint.size = stat.st_size
+            fingerprint.content_hash = content_hash
+            to_save.append(fingerprint)
+
+            if unchanged and not force:
+                self.skip_pofile(pofile, locale)
+            else:
+                changed.append((pofile, locale))
+
+        return changed, to_save
+
+    def forget_source_files(self):
+        """
+        Deletes fingerprints of po files whose entries were changed outside
+        of load_data_from_po, e.g. by makemessages or restore, so the db does
+        not match the file anymore and it is loaded again next time. Entries
+        saved or deleted one by one forget their fingerprint by signal.
+        """
+        if self.loading or not self.changed_units:
+            return
+        TranslationSourceFile.forget(self.changed_units)
+        self.changed_units = set()
+
+    def skip_pofile(self, pofile, locale):
+        if settings.DEBUG:
+            print ("skipping unchanged pofile", pofile)
+        language = get_lang_from_dirname(locale)
+        domain = os.path.splitext(os.path.basename(pofile))[0]
+        locale_path = get_relative_locale_path(pofile)
+        self.tors.setdefault(locale_path, {}).setdefault(language, {}).setdefault(domain, set())
+        self.skipped_units.add((locale_path, language, domain))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:36
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0004_set_new_relative_paths'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationSourceFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('changed', models.DateTimeField(auto_now=True, verbose_name='admin-translation_source_file-changed-label')),
+                ('path', models.CharField(max_length=512, unique=True, verbose_name='admin-translation_source_file-path-label')),
+                ('mtime', models.FloatField(verbose_name='admin-translation_source_file-mtime-label')),
+                ('size', models.BigIntegerField(verbose_name='admin-translation_source_file-size-label')),
+                ('content_hash', models.CharField(max_length=40, verbose_name='admin-translation_source_file-content_hash-label')),
+            ],
+            options={
+                'verbose_name': 'Admin-translation_source_file-singular',
+                'verbose_name_plural': 'Admin-translation_source_file-plural',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0005_translationsourcefile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationCompileState',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compiled', models.DateTimeField(auto_now=True, verbose_name='admin-translation_compile_state-compiled-label')),
+                ('language', models.CharField(max_length=7, verbose_name='admin-translation_compile_state-language-label')),
+                ('locale_path', models.CharField(max_length=256, verbose_name='admin-translation_compile_state-locale_path-label')),
+                ('domain', models.CharField(max_length=256, verbose_name='admin-translation_compile_state-domain-label')),
+                ('last_changed', models.DateTimeField(null=True, verbose_name='admin-translation_compile_state-last_changed-label')),
+            ],
+            options={
+                'verbose_name': 'Admin-translation_compile_state-singular',
+                'verbose_name_plural': 'Admin-translation_compile_state-plural',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='translationcompilestate',
+            unique_together=set([('language', 'locale_path', 'domain')]),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:41
+from __future__ import unicode_literals
+
+import hashlib
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def store_contents(apps, schema_editor):
+    TranslationBackup = apps.get_model('translation_manager', 'TranslationBackup')
+    TranslationBackupContent = apps.get_model('translation_manager', 'TranslationBackupContent')
+    for row in TranslationBackup.objects.all().iterator():
+        content = row.content.encode('utf-8')
+        content_hash = hashlib.sha1(content).hexdigest()
+        stored_content = TranslationBackupContent.objects.filter(content_hash=content_hash).first()
+        if stored_content is None:
+            stored_content = TranslationBackupContent.objects.create(content_hash=content_hash,
+                                                                     data=zlib.compress(content, 9))
+        TranslationBackup.objects.filter(pk=row.pk).update(stored_content=stored_content)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0006_translationcompilestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationBackupContent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='admin-translation_backup_content-created-label')),
+                ('content_hash', models.CharField(max_length=40, unique=True, verbose_name='admin-translation_backup_content-content_hash-label')),
+                ('data', models.BinaryField(verbose_name='admin-translation_backup_content-data-label')),
+            ],
+            options={
+                'verbose_name': 'Admin-translation_backup_content-singular',
+                'verbose_name_plural': 'Admin-translation_backup_content-plural',
+            },
+        ),
+        migrations.AddField(
+            model_name='translationbackup',
+            name='stored_content',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='translation_manager.TranslationBackupContent', verbose_name='admin-translation_backup-content'),
+        ),
+        migrations.RunPython(store_contents, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='translationbackup',
+            name='content',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:43
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0007_translationbackupcontent'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='translationbackup',
+            index_together=set([('language', 'locale_path', 'domain', 'created')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:48
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0008_translationbackup_unit_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='translationentry',
+            name='changed',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='admin-translation_entry-changed-label'),
+        ),
+    ]
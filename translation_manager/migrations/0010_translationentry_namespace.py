@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 00:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from translation_manager.utils import chunks, get_namespace
+
+
+def store_namespaces(apps, schema_editor):
+    TranslationEntry = apps.get_model('translation_manager', 'TranslationEntry')
+    pks_by_namespace = {}
+    for pk, original in TranslationEntry.objects.values_list('pk', 'original').iterator():
+        namespace = get_namespace(original)
+        if namespace:
+            pks_by_namespace.setdefault(namespace, []).append(pk)
+    for namespace, pks in pks_by_namespace.items():
+        for batch in chunks(pks, 500):
+            TranslationEntry.objects.filter(pk__in=batch).update(namespace=namespace)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0009_translationentry_changed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationentry',
+            name='namespace',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=128, verbose_name='admin-translation_entry-namespace-label'),
+        ),
+        migrations.RunPython(store_namespaces, migrations.RunPython.noop),
+    ]
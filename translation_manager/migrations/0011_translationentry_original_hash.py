@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+from translation_manager.utils import bulk_update, chunks, get_original_hash
+
+
+def store_original_hashes(apps, schema_editor):
+    """
+    Stores hashes of originals and deletes duplicate entries, the published
+    and translated entry of each (original, language, locale_path, domain)
+    with the lowest id is kept.
+    """
+    TranslationEntry = apps.get_model('translation_manager', 'TranslationEntry')
+
+    kept = {}
+    duplicates = []
+    hashed = []
+    entries = TranslationEntry.objects.order_by('pk').values_list(
+        'pk', 'original', 'language', 'locale_path', 'domain', 'translation', 'is_published')
+    for pk, original, language, locale_path, domain, translation, is_published in entries.iterator():
+        original_hash = get_original_hash(original)
+        key = (original_hash, language, locale_path, domain)
+        rank = (not is_published, not translation)
+        if key not in kept:
+            kept[key] = (rank, pk)
+            hashed.append(TranslationEntry(pk=pk, original_hash=original_hash))
+        elif rank < kept[key][0]:
+            duplicates.append(kept[key][1])
+            kept[key] = (rank, pk)
+            hashed.append(TranslationEntry(pk=pk, original_hash=original_hash))
+        else:
+            duplicates.append(pk)
+
+    for batch in chunks(duplicates, 500):
+        TranslationEntry.objects.filter(pk__in=batch).delete()
+
+    duplicates = set(duplicates)
+    bulk_update(TranslationEntry, [entry for entry in hashed if entry.pk not in duplicates], ['original_hash'],
+                batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0010_translationentry_namespace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationentry',
+            name='original_hash',
+            field=models.CharField(default='', editable=False, max_length=40, verbose_name='admin-translation_entry-original_hash-label'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(store_original_hashes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='translationentry',
+            unique_together=set([('original_hash', 'language', 'locale_path', 'domain')]),
+        ),
+    ]
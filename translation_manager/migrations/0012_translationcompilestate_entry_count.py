@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-17 01:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translation_manager', '0011_translationentry_original_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translationcompilestate',
+            name='entry_count',
+            field=models.IntegerField(null=True, verbose_name='admin-translation_compile_state-entry_count-label'),
+        ),
+    ]
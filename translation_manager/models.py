@@ -1,18 +1,103 @@
-import polib
+import hashlib
 import os
+import zlib
 
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.template.defaultfilters import capfirst as cf
 from django.utils.translation import ugettext_lazy as _
 
+from .cache import bump_catalog_version
 from .settings import get_settings
+from .utils import chunks, get_dirname_from_lang, get_namespace, get_original_hash, NAMESPACE_MAX_LENGTH
+
+
+def get_hint_languages():
+    "Returns TRANSLATIONS_HINT_LANGUAGE as list of languages"
+    languages = get_settings('TRANSLATIONS_HINT_LANGUAGE')
+    if not languages:
+        return []
+    if isinstance(languages, (list, tuple)):
+        return list(languages)
+    return [languages]
+
+
+class TranslationEntryQuerySet(models.QuerySet):
+    _hint_languages = None
+
+    def _clone(self, *args, **kwargs):
+        clone = super(TranslationEntryQuerySet, self)._clone(*args, **kwargs)
+        clone._hint_languages = self._hint_languages
+        return clone
+
+    def _fetch_all(self):
+        fetched = self._result_cache is not None
+        super(TranslationEntryQuerySet, self)._fetch_all()
+        if not fetched and self._hint_languages is not None:
+            self.resolve_hints([entry for entry in self._result_cache if isinstance(entry, TranslationEntry)],
+                               self._hint_languages)
+
+    def with_hints(self, *languages):
+        """
+        Returns queryset whose entries get hints of languages, TRANSLATIONS_HINT_LANGUAGE
+        by default, resolved by a single query when it is evaluated.
+        """
+        clone = self._clone()
+        clone._hint_languages = list(languages) or None
+        if clone._hint_languages is None:
+            clone._hint_languages = get_hint_languages()
+        return clone
+
+    def resolve_hints(self, entries, languages=None):
+        """
+        Sets hints of entries, translations of the same originals in languages
+        (TRANSLATIONS_HINT_LANGUAGE by default), domains and locale paths, or
+        in TRANSLATIONS_HINT_LANGUAGE_FORCED_RELATIVE_LOCALE_PATH. Hints are
+        read by one query per TRANSLATIONS_BULK_BATCH_SIZE entries using the
+        original hash index.
+
+        Hints are set as entry._hints {language: translation} and entry._hint
+        text displayed in admin.
+        """
+        if languages is None:
+            languages = get_hint_languages()
+        forced_locale_path = get_settings('TRANSLATIONS_HINT_LANGUAGE_FORCED_RELATIVE_LOCALE_PATH')
+
+        for batch in chunks(entries, get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+            hints = {}
+            if languages:
+                for entry in batch:
+                    if not entry.original_hash:
+                        entry.original_hash = get_original_hash(entry.original)
+                hint_entries = self.model.objects.filter(
+                    is_published=True,
+                    language__in=languages,
+                    original_hash__in=set(entry.original_hash for entry in batch),
+                ).values_list('original_hash', 'domain', 'locale_path', 'language', 'translation')
+                for original_hash, domain, locale_path, language, translation in hint_entries.iterator():
+                    hints.setdefault((original_hash, domain, locale_path), {})[language] = translation
+
+            for entry in batch:
+                entry._hints = hints.get((entry.original_hash, entry.domain, forced_locale_path or entry.locale_path), {})
+                if len(languages) == 1:
+                    entry._hint = entry._hints.get(languages[0], "")
+                else:
+                    entry._hint = u" | ".join(u"%s: %s" % (language, entry._hints[language])
+                                              for language in languages if entry._hints.get(language))
+        return entries
 
 
 class TranslationEntry(models.Model):
     created = models.DateTimeField(auto_now_add=True, verbose_name=_(u"admin-translation_entry-created-label"))
-    changed = models.DateTimeField(auto_now=True, verbose_name=_(u"admin-translation_entry-changed-label"))
+    changed = models.DateTimeField(auto_now=True, db_index=True, verbose_name=_(u"admin-translation_entry-changed-label"))
     language = models.CharField(db_index=True, max_length=7, verbose_name=_(u"admin-translation_entry-language-label"))
     original = models.TextField(verbose_name=_(u"admin-translation_entry-original-label"))
+    original_hash = models.CharField(max_length=40, editable=False,
+                                     verbose_name=_(u"admin-translation_entry-original_hash-label"))
+    namespace = models.CharField(db_index=True, blank=True, max_length=NAMESPACE_MAX_LENGTH, editable=False,
+                                 verbose_name=_(u"admin-translation_entry-namespace-label"))
     translation = models.TextField(blank=True, verbose_name=_(u"admin-translation_entry-translation-label"))
     occurrences = models.TextField(blank=True, verbose_name=_(u"admin-translation_entry-occurrences-label"))
     is_published = models.BooleanField(default=True, editable=False, verbose_name=_(u"admin-translation_entry-is_published-label"))
@@ -20,6 +105,8 @@ class TranslationEntry(models.Model):
     locale_parent_dir = models.CharField(db_index=True, max_length=256, verbose_name=_(u"admin-translation_entry-locale_parent_dir-label"))
     domain = models.CharField(db_index=True, max_length=256, verbose_name=_(u"admin-translation_entry-domain-label"))
 
+    objects = TranslationEntryQuerySet.as_manager()
+
     class Meta:
         verbose_name = cf(_(u"admin-translation_entry-singular"))
         verbose_name_plural = cf(_(u"admin-translation_entry-plural"))
@@ -27,6 +114,7 @@ class TranslationEntry(models.Model):
         permissions = (
             ('load', _('admin-translation_entry-load-from-po')),
         )
+        unique_together = (('original_hash', 'language', 'locale_path', 'domain'),)
 
     def __unicode__(self):
         return "(%s:%s:%s:%s)" % (self.pk, self.original[:64], self.language, self.locale_path)
@@ -34,22 +122,100 @@ class TranslationEntry(models.Model):
     def __str__(self):
         return "(%s:%s:%s:%s)" % (self.pk, self.original[:64], self.language, self.locale_path)
 
-    def get_hint(self):
-        self.hint = ""
+    def save(self, *args, **kwargs):
+        self.original_hash = get_original_hash(self.original)
+        self.namespace = get_namespace(self.original)
+        super(TranslationEntry, self).save(*args, **kwargs)
 
-        if not self.hint:
-            if hasattr(self, '_hint'):
-                self.hint = self._hint
-            else:
-                try:
-                    self.hint = self._meta.model.objects.get(domain=self.domain, locale_path=self.locale_path, original=self.original, language=get_settings('TRANSLATIONS_HINT_LANGUAGE')).translation
-                except self._meta.model.DoesNotExist:
-                    pass
+    def validate_unique(self, exclude=None):
+        """
+        Validates unique original hash also when the original is edited by
+        a form, which excludes original_hash as it is not editable.
+        """
+        self.original_hash = get_original_hash(self.original)
+        super(TranslationEntry, self).validate_unique(exclude=exclude)
 
+        unique_fields = self._meta.unique_together[0]
+        if not exclude or 'original' in exclude or not set(unique_fields).intersection(exclude):
+            return
+        entries = self._meta.model.objects.filter(**dict((field, getattr(self, field)) for field in unique_fields))
+        if self.pk is not None:
+            entries = entries.exclude(pk=self.pk)
+        if entries.exists():
+            raise ValidationError({'original': self.unique_error_message(self._meta.model, unique_fields)})
+
+    def get_hint(self):
+        if not hasattr(self, '_hint'):
+            self._meta.model.objects.resolve_hints([self])
+        self.hint = self._hint
         return self.hint
     get_hint.short_description = cf(_("admin-translation_entry-hint-label"))
 
 
+@receiver(post_save, sender=TranslationEntry)
+@receiver(post_delete, sender=TranslationEntry)
+def translation_entry_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+    # po file of edited or deleted entry does not match db anymore
+    TranslationSourceFile.forget([(instance.locale_path, instance.language, instance.domain)])
+
+
+class TranslationBackupContent(models.Model):
+    """
+    Compressed po file content shared by all backups with the same content
+    """
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_(u"admin-translation_backup_content-created-label"))
+    content_hash = models.CharField(unique=True, max_length=40, verbose_name=_(u"admin-translation_backup_content-content_hash-label"))
+    data = models.BinaryField(verbose_name=_(u"admin-translation_backup_content-data-label"))
+
+    class Meta:
+        verbose_name = cf(_(u"admin-translation_backup_content-singular"))
+        verbose_name_plural = cf(_(u"admin-translation_backup_content-plural"))
+
+    @staticmethod
+    def get_hash(content):
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def get_or_create_for(cls, content):
+        "Returns stored content of given text, created if it is not stored yet"
+        content_hash = cls.get_hash(content)
+        try:
+            return cls.objects.get(content_hash=content_hash)
+        except cls.DoesNotExist:
+            return cls.objects.create(content_hash=content_hash, data=zlib.compress(content.encode('utf-8'), 9))
+
+    @classmethod
+    def get_or_create_many(cls, contents):
+        """
+        Returns stored contents of {content_hash: text} dict by content hash,
+        contents not stored yet are created by bulk_create
+        """
+        stored = {}
+        for hashes in chunks(list(contents), get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+            stored.update((content.content_hash, content) for content in cls.objects.filter(content_hash__in=hashes))
+
+        missing = [content_hash for content_hash in contents if content_hash not in stored]
+        if missing:
+            cls.objects.bulk_create([
+                cls(content_hash=content_hash, data=zlib.compress(contents[content_hash].encode('utf-8'), 9))
+                for content_hash in missing
+            ])
+            for hashes in chunks(missing, get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+                stored.update((content.content_hash, content) for content in cls.objects.filter(content_hash__in=hashes))
+
+        return stored
+
+    def get_content(self):
+        return zlib.decompress(bytes(self.data)).decode('utf-8')
+
+    def __unicode__(self):
+        return "(%s:%s)" % (self.pk, self.content_hash)
+
+    def __str__(self):
+        return "(%s:%s)" % (self.pk, self.content_hash)
+
+
 class TranslationBackup(models.Model):
     created = models.DateTimeField(auto_now_add=True, verbose_name=_(u"admin-translation_backup-created-label"))
     changed = models.DateTimeField(auto_now=True, verbose_name=_(u"admin-translation_backup-changed-label"))
@@ -58,28 +224,94 @@ class TranslationBackup(models.Model):
     locale_parent_dir = models.CharField(db_index=True, max_length=256, verbose_name=_(u"admin-translation_backup-locale_parent_dir-label"))
     domain = models.CharField(db_index=True, max_length=256, verbose_name=_(u"admin-translation_backup-domain-label"))
 
-    content = models.TextField(verbose_name=_(u"admin-translation_backup-content"))
+    stored_content = models.ForeignKey(TranslationBackupContent, null=True, on_delete=models.PROTECT,
+                                       verbose_name=_(u"admin-translation_backup-content"))
 
     class Meta:
         verbose_name = cf(_(u"admin-translation_backup-singular"))
         verbose_name_plural = cf(_(u"admin-translation_backup-plural"))
         ordering = ('-created',)
+        index_together = (('language', 'locale_path', 'domain', 'created'),)
+
+    def _get_content(self):
+        if not hasattr(self, '_content'):
+            self._content = self.stored_content.get_content() if self.stored_content_id else u''
+        return self._content
 
-    def restore(self):
-        po_filename = os.path.join(self.locale_path, self.language, 'LC_MESSAGES',
-                                   self.domain + '.mo')
+    def _set_content(self, content):
+        self._content = content
+        self.stored_content = None
 
-        mo_filename = os.path.join(self.locale_path, self.language, 'LC_MESSAGES',
-                                   self.domain + '.mo')
+    _get_content.short_description = cf(_(u"admin-translation_backup-content"))
+    content = property(_get_content, _set_content)
 
-        with open(po_filename, 'w') as output:
-            output.write(self.content.encode('utf-8'))
+    def save(self, *args, **kwargs):
+        if self.stored_content_id is None and hasattr(self, '_content'):
+            self.stored_content = TranslationBackupContent.get_or_create_for(self._content)
+        super(TranslationBackup, self).save(*args, **kwargs)
 
-        po = polib.pofile(po_filename)
-        po.save_as_mofile(mo_filename)
+    def restore(self, reimport=False):
+        from .manager import Manager
+        Manager().restore_backups([self], reimport=reimport)
 
     def __unicode__(self):
         return "(%s:%s:%s)" % (self.pk, self.language, self.locale_path)
 
     def __str__(self):
         return "(%s:%s:%s)" % (self.pk, self.language, self.locale_path)
+
+
+class TranslationSourceFile(models.Model):
+    """
+    Fingerprint of po file loaded to db, used to skip unchanged files on next load
+    """
+    changed = models.DateTimeField(auto_now=True, verbose_name=_(u"admin-translation_source_file-changed-label"))
+    path = models.CharField(unique=True, max_length=512, verbose_name=_(u"admin-translation_source_file-path-label"))
+    mtime = models.FloatField(verbose_name=_(u"admin-translation_source_file-mtime-label"))
+    size = models.BigIntegerField(verbose_name=_(u"admin-translation_source_file-size-label"))
+    content_hash = models.CharField(max_length=40, verbose_name=_(u"admin-translation_source_file-content_hash-label"))
+
+    class Meta:
+        verbose_name = cf(_(u"admin-translation_source_file-singular"))
+        verbose_name_plural = cf(_(u"admin-translation_source_file-plural"))
+
+    @staticmethod
+    def get_path(locale_path, language, domain):
+        "Returns path of po file of (locale_path, language, domain) unit relative to TRANSLATIONS_BASE_DIR"
+        return os.path.join(locale_path, get_dirname_from_lang(language), 'LC_MESSAGES', '%s.po' % domain)
+
+    @classmethod
+    def forget(cls, units):
+        "Deletes fingerprints of (locale_path, language, domain) units, so their po files are loaded again"
+        paths = [cls.get_path(*unit) for unit in units]
+        for chunk in chunks(paths, get_settings('TRANSLATIONS_BULK_BATCH_SIZE')):
+            cls.objects.filter(path__in=chunk).delete()
+
+    def __unicode__(self):
+        return "(%s:%s)" % (self.pk, self.path)
+
+    def __str__(self):
+        return "(%s:%s)" % (self.pk, self.path)
+
+
+class TranslationCompileState(models.Model):
+    """
+    Newest change and number of entries of a po/mo file at its last compilation
+    """
+    compiled = models.DateTimeField(auto_now=True, verbose_name=_(u"admin-translation_compile_state-compiled-label"))
+    language = models.CharField(max_length=7, verbose_name=_(u"admin-translation_compile_state-language-label"))
+    locale_path = models.CharField(max_length=256, verbose_name=_(u"admin-translation_compile_state-locale_path-label"))
+    domain = models.CharField(max_length=256, verbose_name=_(u"admin-translation_compile_state-domain-label"))
+    last_changed = models.DateTimeField(null=True, verbose_name=_(u"admin-translation_compile_state-last_changed-label"))
+    entry_count = models.IntegerField(null=True, verbose_name=_(u"admin-translation_compile_state-entry_count-label"))
+
+    class Meta:
+        verbose_name = cf(_(u"admin-translation_compile_state-singular"))
+        verbose_name_plural = cf(_(u"admin-translation_compile_state-plural"))
+        unique_together = (('language', 'locale_path', 'domain'),)
+
+    def __unicode__(self):
+        return "(%s:%s:%s:%s)" % (self.pk, self.language, self.locale_path, self.domain)
+
+    def __str__(self):
+        return "(%s:%s:%s:%s)" % (self.pk, self.language, self.locale_path, self.domain)
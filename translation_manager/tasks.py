@@ -13,7 +13,15 @@ if get_settings('TRANSLATIONS_PROCESSING_METHOD') == 'async_django_rq':
     def makemessages_task():
         call_command('makemessages')
         cache.delete('make_translations_running')
+
+
+    @job(get_settings('TRANSLATIONS_PROCESSING_QUEUE'))
+    def compile_translations_task():
+        call_command('compile_translations')
 else:
     def makemessages_task():
         call_command('makemessages')
         cache.delete('make_translations_running')
+
+    def compile_translations_task():
+        call_command('compile_translations')
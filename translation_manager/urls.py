@@ -11,6 +11,9 @@ if get_settings('TRANSLATIONS_PROCESSING_METHOD') == 'async_django_rq':
 if get_settings('TRANSLATIONS_ENABLE_API_COMMUNICATION'):
     from translation_manager import views
 
+    urlpatterns.append(
+        url(r'^$', views.TranslationBatchView.as_view(), name='translations_batch'),
+    )
     urlpatterns.append(
         url(r'^(?P<language>[\w-]+)/$', views.TranslationListView.as_view(), name='translations'),
     )
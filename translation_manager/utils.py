@@ -1,7 +1,8 @@
 
+import hashlib
 import os
 
-from django.db.models import Q
+from django.db.models import Case, Q, Value, When
 
 from .settings import get_settings
 
@@ -36,12 +37,88 @@ def get_lang_from_dirname(dirname):
     return lang
 
 
+NAMESPACE_MAX_LENGTH = 128
+
+
+def get_original_hash(original):
+    "Returns fixed width sha1 hex digest of original"
+    return hashlib.sha1(original.encode('utf-8')).hexdigest()
+
+
+def get_namespace(original):
+    "Returns prefix of original up to and including the first separator 'admin-foo-bar' => 'admin-'"
+    end = None
+    for separator in get_settings('TRANSLATIONS_NAMESPACE_SEPARATORS'):
+        index = original.find(separator)
+        if index >= 0 and (end is None or index + len(separator) < end):
+            end = index + len(separator)
+    if end is None or end > NAMESPACE_MAX_LENGTH:
+        return ''
+    return original[:end]
+
+
+def get_filter_q(filter_):
+    "Returns filter of originals by TRANSLATIONS_FORCE_FILTERS_MODE"
+    if get_settings('TRANSLATIONS_FORCE_FILTERS_MODE') != 'prefix':
+        return Q(original__contains=filter_)
+
+    namespace = get_namespace(filter_)
+    if not namespace:
+        return Q(original__startswith=filter_)
+    if namespace == filter_:
+        return Q(namespace=namespace)
+    return Q(namespace=namespace, original__startswith=filter_)
+
+
+def get_filters_q(options):
+    "Returns ORed filter of options"
+    filter_ = options[0]
+    q = get_filter_q(filter_)
+    for filter_ in options[1:]:
+        q = q | get_filter_q(filter_)
+    return q
+
+
 def filter_queryset(qs, options):
     qs = qs.filter(is_published=True)
     if options:
-        filter_ = options[0]
-        q = Q(original__contains=filter_)
-        for filter_ in options[1:]:
-            q = q | Q(original__contains=filter_)
-        qs = qs.filter(q)
+        qs = qs.filter(get_filters_q(options))
     return qs
+
+
+def chunks(iterable, size):
+    "Splits iterable to lists of given size [1, 2, 3], 2 => [1, 2], [3]"
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def bulk_update(model, objs, fields, batch_size=None):
+    "Updates fields of already saved objs in batches, one query per batch"
+    batch_size = batch_size or get_settings('TRANSLATIONS_BULK_BATCH_SIZE')
+    if hasattr(model.objects, 'bulk_update'):
+        model.objects.bulk_update(objs, fields, batch_size=batch_size)
+        return
+
+    # django < 2.2
+    for batch in chunks(objs, batch_size):
+        values = {}
+        for field in fields:
+            output_field = model._meta.get_field(field)
+            whens = [When(pk=obj.pk, then=Value(getattr(obj, field), output_field=output_field)) for obj in batch]
+            values[field] = Case(*whens, output_field=output_field)
+        model.objects.filter(pk__in=[obj.pk for obj in batch]).update(**values)
+
+
+def get_file_hash(path):
+    "Returns sha1 hex digest of file content"
+    content_hash = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            content_hash.update(block)
+    return content_hash.hexdigest()
@@ -1,15 +1,7 @@
 from django.contrib.admin.views.main import ChangeList
-from django.db.models import Q
 
 from .settings import get_settings
 
-hint_sql_template = (
-    'SELECT te2.* FROM %s AS te1 INNER JOIN %s AS te2 ON '
-    '(te1.original = te2.original '
-    'AND te1.domain = te2.domain AND te2.locale_path = %s) '
-    'WHERE te2.is_published=\'1\' '
-    'AND te1.id IN (%s) AND te2.language = \'%s\'')
-
 
 class TranslationChangeList(ChangeList):
     def __init__(self, *args, **kwargs):
@@ -20,63 +12,126 @@ class TranslationChangeList(ChangeList):
 
     def prep_hints(self):
         from .models import TranslationEntry
-        entry_ids = [str(entry.id) for entry in self.result_list]
+        TranslationEntry.objects.resolve_hints(self.result_list)
 
-        # hint locale path from settings variable
-        hint_locale = get_settings('TRANSLATIONS_HINT_LANGUAGE_FORCED_RELATIVE_LOCALE_PATH')  # noqa
-        if not hint_locale:
-            hint_locale = 'te1.locale_path'
-        else:
-            hint_locale = "'%s'" % hint_locale
 
-        # pylint:disable=protected-access
-        hint_sql = hint_sql_template % (
-            TranslationEntry._meta.db_table,
-            TranslationEntry._meta.db_table,
-            hint_locale,
-            ",".join(entry_ids),
-            get_settings('TRANSLATIONS_HINT_LANGUAGE'))
+if get_settings('TRANSLATIONS_ENABLE_API_COMMUNICATION'):
+    import json
 
-        hint_qs = TranslationEntry.objects.raw(hint_sql)
+    from django.conf import settings
+    from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+    from django.utils.cache import patch_vary_headers
+    from django.utils.decorators import method_decorator
+    from django.views.decorators.http import condition
+    from rest_framework.views import APIView
+    from rest_framework.permissions import AllowAny
+    from translation_manager.cache import get_cache, get_catalog_version, get_version_datetime
+    from translation_manager.exports import iter_language_json, iter_batch_json, get_api_delta, parse_since, \
+        get_cached_payloads, get_encodings, get_accepted_encoding
 
-        hint_dict = dict([(hint.original, hint.translation)
-                          for hint in hint_qs])
 
-        for result in self.result_list:
-            # pylint:disable=protected-access
-            result._hint = hint_dict.get(result.original, "")
+    def get_payload_encoding(request):
+        return get_accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), get_encodings())
 
+    def get_translations_etag(request, language, *args, **kwargs):
+        version = get_catalog_version()
+        if version is not None:
+            return '"%s-%s-%s"' % (language, version, get_payload_encoding(request))
 
-if get_settings('TRANSLATIONS_ENABLE_API_COMMUNICATION'):
-    from rest_framework.views import APIView
-    from rest_framework.response import Response
-    from rest_framework.permissions import AllowAny
-    from translation_manager.serializers import TranslationSerializer
-    from translation_manager.models import TranslationEntry
-    from translation_manager.utils import filter_queryset
+    def get_translations_last_modified(request, *args, **kwargs):
+        version = get_catalog_version()
+        if version is not None:
+            return get_version_datetime(version)
 
 
-    class TranslationListView(APIView):
-        """
-        get translations in selected language in json
-        """
+    def get_batch_etag(request, *args, **kwargs):
+        version = get_catalog_version()
+        if version is not None:
+            return '"batch-%s"' % version
+
+    def get_list_param(request, name):
+        values = []
+        for value in request.GET.get(name, '').split(','):
+            value = value.strip()
+            if value and value not in values:
+                values.append(value)
+        return values
+
+
+    class TranslationAPIView(APIView):
         authentication_classes = get_settings('TRANSLATIONS_API_AUTHENTICATION_CLASSES') if get_settings(
             'TRANSLATIONS_API_AUTHENTICATION_CLASSES') else ()
         permission_classes = get_settings('TRANSLATIONS_API_PERMISSION_CLASSES') if get_settings(
             'TRANSLATIONS_API_PERMISSION_CLASSES') else (AllowAny,)
 
+
+    class TranslationListView(TranslationAPIView):
+        """
+        get translations in selected language in json
+        """
+
+        @method_decorator(condition(etag_func=get_translations_etag, last_modified_func=get_translations_last_modified))
         def get(self, request, language, format=None):
             """
             Return a list of all translations for selected language.
+            Json is streamed straight from db rows, or cached for current
+            catalog version if TRANSLATIONS_API_CACHE is set. Cached json
+            is served precompressed by encoding accepted by client.
+
+            With since parameter (version, unix timestamp or ISO datetime)
+            only translations changed and removed since then are returned.
+            Languages not in LANGUAGES setting are rejected.
             """
-            queryset = filter_queryset(TranslationEntry.objects.filter(language=language),
-                                       get_settings('TRANSLATIONS_API_QUERYSET_FORCE_FILTERS'))
-            if not get_settings('TRANSLATIONS_API_RETURN_ALL'):
-                queryset = queryset.exclude(Q(translation__isnull=True) | Q(translation__exact=''))
+            if language not in [code for code, name in settings.LANGUAGES]:
+                return HttpResponseBadRequest('Invalid language')
 
-            result = {}
+            if 'since' in request.GET:
+                since = parse_since(request.GET['since'])
+                if since is None:
+                    return HttpResponseBadRequest('Invalid since parameter')
+                return JsonResponse(get_api_delta(language, since))
 
-            for object in queryset:
-                result[object.original] = object.translation
+            if get_cache() is None:
+                return StreamingHttpResponse(iter_language_json(language), content_type='application/json')
 
-            return Response(result)
+            payloads = get_cached_payloads(language)
+            encoding = get_payload_encoding(request)
+            response = HttpResponse(payloads.get(encoding, payloads['identity']), content_type='application/json')
+            if encoding in payloads and encoding != 'identity':
+                response['Content-Encoding'] = encoding
+            patch_vary_headers(response, ('Accept-Encoding',))
+            return response
+
+
+    class TranslationBatchView(TranslationAPIView):
+        """
+        get translations in several languages in json
+        """
+        @method_decorator(condition(etag_func=get_batch_etag, last_modified_func=get_translations_last_modified))
+        def get(self, request, format=None):
+            """
+            Return translations of languages given by comma separated languages
+            parameter, all languages by default, {"cs": {...}, "en": {...}}.
+            Languages not in LANGUAGES setting are rejected.
+            Translations can be limited by comma separated domains and
+            prefixes of originals.
+
+            Without domains and prefixes json is composed of cached payloads
+            of languages if TRANSLATIONS_API_CACHE is set, otherwise it is
+            streamed from a single query.
+            """
+            available = [code for code, name in settings.LANGUAGES]
+            languages = get_list_param(request, 'languages')
+            if any(language not in available for language in languages):
+                return HttpResponseBadRequest('Invalid languages parameter')
+            languages = languages or available
+            domains = get_list_param(request, 'domains')
+            prefixes = get_list_param(request, 'prefixes')
+
+            if get_cache() is None or domains or prefixes:
+                return StreamingHttpResponse(iter_batch_json(languages, domains=domains, prefixes=prefixes),
+                                             content_type='application/json')
+
+            content = b','.join(json.dumps(language).encode('utf-8') + b':' + get_cached_payloads(language)['identity']
+                                for language in languages)
+            return HttpResponse(b'{' + content + b'}', content_type='application/json')